@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+import argparse
+import time
+
+from check_brackets import per_type_offsets
+from detailed_bracket_check import bracket_structure_offsets
+from file_buffer import FileBuffer
+from file_discovery import walk_files
+from js_lexer import code_only
+from numpy_engine import HAVE_NUMPY, nested_scan, per_type_scan
+
+def char_loop_per_type(data):
+    """The former per-character engine of find_bracket_position_issues, kept as the baseline"""
+    lines = data.decode('utf-8', 'replace').replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    stacks = {'(': [], '[': [], '{': []}
+    closers = {')': '(', ']': '[', '}': '{'}
+    unmatched = []
+    for line_num, line in enumerate(lines, 1):
+        for char_pos, char in enumerate(line):
+            if char in stacks:
+                stacks[char].append((line_num, char_pos))
+            elif char in closers:
+                if stacks[closers[char]]:
+                    stacks[closers[char]].pop()
+                else:
+                    unmatched.append((line_num, char_pos))
+    return unmatched + [position for stack in stacks.values() for position in stack]
+
+def char_loop_nested(data):
+    """The former per-character engine of analyze_bracket_structure, kept as the baseline"""
+    lines = data.decode('utf-8', 'replace').replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    bracket_stack = []
+    issues = []
+    for line_num, line in enumerate(lines, 1):
+        for char_pos, char in enumerate(line):
+            if char in '([{':
+                bracket_stack.append((char, line_num, char_pos))
+            elif char in ')]}':
+                expected_open = '([{'[{')': 0, ']': 1, '}': 2}[char]]
+                if not bracket_stack:
+                    issues.append((line_num, char_pos))
+                elif bracket_stack.pop()[0] != expected_open:
+                    issues.append((line_num, char_pos))
+    return issues + [(line_num, char_pos) for _, line_num, char_pos in bracket_stack]
+
+def with_lexer(engine):
+    """engine run on the code of a file only, lexing included in the time"""
+    return lambda data: engine(code_only(data))
+
+def offset_positions(buffer, found):
+    """(line, column) of every (offset, ...) result of an offset-based engine"""
+    closer_issues, unclosed = found
+    positions = buffer.line_cols([item[0] for item in closer_issues + unclosed])
+    return [positions[item[0]] for item in closer_issues + unclosed]
+
+def time_engine(engine, contents, repeat):
+    """Best wall time of running engine over all contents, out of repeat runs"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for data in contents:
+            engine(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the bracket matching engines on real sources')
+    parser.add_argument('root', nargs='?', default='backend/src/services',
+                        help='directory with the sources to match (default: backend/src/services)')
+    parser.add_argument('--repeat', type=int, default=5, metavar='N',
+                        help='take the best of N runs per engine (default: 5)')
+    args = parser.parse_args()
+
+    paths = sorted(walk_files(args.root, ('.js', '.ts', '.tsx')))
+    contents = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            contents.append(f.read())
+    total_bytes = sum(len(data) for data in contents)
+
+    engines = [
+        ('per type', [
+            ('char loop', char_loop_per_type, None),
+            ('regex tokens', per_type_offsets, offset_positions),
+            ('lexer + regex', with_lexer(per_type_offsets), None),
+        ]),
+        ('shared stack', [
+            ('char loop', char_loop_nested, None),
+            ('regex tokens', bracket_structure_offsets, offset_positions),
+            ('lexer + regex', with_lexer(bracket_structure_offsets), None),
+        ]),
+    ]
+    if HAVE_NUMPY:
+        engines[0][1].append(('numpy', per_type_scan, offset_positions))
+        engines[1][1].append(('numpy', nested_scan, offset_positions))
+
+    print(f'=== BRACKET ENGINE BENCHMARK ({len(paths)} files, {total_bytes / 1024:.0f} KiB) ===\n')
+    for check, variants in engines:
+        baseline_engine = variants[0][1]
+        baseline = None
+        for name, engine, to_positions in variants:
+            # Every engine that sees all brackets has to report the same positions
+            # as the baseline; the lexer variants skip literals and differ by design
+            for data in contents if to_positions is not None else ():
+                positions = to_positions(FileBuffer(None, data), engine(data))
+                if sorted(positions) != sorted(baseline_engine(data)):
+                    raise SystemExit(f'error: {name} ({check}) disagrees with the char loop')
+            elapsed = time_engine(engine, contents, args.repeat)
+            if baseline is None:
+                baseline = elapsed
+            print(f'{check:<14} {name:<14} {elapsed * 1000:9.2f} ms   {baseline / elapsed:6.1f}x')
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,21 @@
+import argparse
 import os
-import glob
+from functools import partial
 
-def check_file_brackets(filepath):
-    """Check bracket pairing in a single file"""
+from bracket_engine import symbol_histogram
+from file_buffer import FileBuffer
+from file_discovery import SOURCE_SPECS, add_discovery_arguments, discover_from_args, group_specs
+from git_source import GitError, staged_contents, staged_files
+from js_lexer import add_lexer_arguments
+from pipeline import add_pipeline_arguments, run_checks
+
+def check_file_brackets(buffer, lexer=False):
+    """Check bracket pairing in a single file (a FileBuffer)"""
+    filepath = buffer.path
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Count brackets
-        round_open = content.count('(')
-        round_close = content.count(')')
-        square_open = content.count('[')
-        square_close = content.count(']')
-        curly_open = content.count('{')
-        curly_close = content.count('}')
-        backticks = content.count('`')
+        # Count brackets on the raw bytes, without decoding the file
+        (round_open, round_close, square_open, square_close,
+         curly_open, curly_close, backticks) = symbol_histogram(buffer.scan_data(lexer))
         
         issues = []
         if round_open != round_close:
@@ -25,6 +26,7 @@ def check_file_brackets(filepath):
             issues.append(f'Curly brackets: {curly_open} open vs {curly_close} close')
         if backticks % 2 != 0:
             issues.append(f'Backticks: {backticks} total (uneven number)')
+        issues.extend(buffer.lexer_issues(lexer))
             
         return {
             'file': filepath,
@@ -45,24 +47,39 @@ def check_file_brackets(filepath):
         }
 
 def main():
-    # Collect all files to check
-    file_patterns = [
-        'backend/src/**/*.js',
-        'src/**/*.ts', 
-        'src/**/*.tsx'
-    ]
-    
-    all_files = []
-    for pattern in file_patterns:
-        all_files.extend(glob.glob(pattern, recursive=True))
+    parser = argparse.ArgumentParser(description='Bracket pairing check')
+    parser.add_argument('--staged', action='store_true',
+                        help='check the staged contents of staged files (pre-commit mode)')
+    add_discovery_arguments(parser)
+    add_pipeline_arguments(parser)
+    add_lexer_arguments(parser)
+    args = parser.parse_args()
+    check = partial(check_file_brackets, lexer=args.lexer)
+
+    sizes = {}
+    if args.staged:
+        try:
+            all_files = sorted(staged_files(group_specs(SOURCE_SPECS)))
+        except GitError as e:
+            raise SystemExit(f'error: {e}')
+    else:
+        # Collect all files to check in a single pass per source root
+        all_files = list(discover_from_args(args, sizes=sizes))
     
     print(f"=== BRACKET PAIRING CHECK ({len(all_files)} files) ===\n")
     
     problem_files = []
     ok_files = []
     
-    for filepath in sorted(all_files):
-        result = check_file_brackets(filepath)
+    if args.staged:
+        # All blobs stream through one git cat-file --batch process
+        results = ((filepath, check(FileBuffer(filepath, data)))
+                   for filepath, data in zip(all_files, staged_contents(all_files)))
+    else:
+        results = run_checks(check, all_files, args.jobs, sizes,
+                             args.read_ahead, args.prefetch)
+    
+    for filepath, result in results:
         
         if result['issues']:
             problem_files.append(result)
@@ -0,0 +1,47 @@
+import re
+from collections import namedtuple
+
+# Every symbol the checkers count; all of them are single ASCII bytes, and in
+# UTF-8 an ASCII byte never occurs inside a multi-byte sequence, so counting
+# bytes gives exactly the same numbers as counting decoded characters.
+SYMBOLS = b'()[]{}`'
+
+# The brackets in the raw bytes; index 0, 1 and 2 is round, square and curly
+BRACKET_PATTERN = re.compile(rb'[()\[\]{}]')
+OPENERS = b'([{'
+CLOSERS = b')]}'
+
+# Byte value of every bracket -> its type index, and the closers as a set
+BRACKET_TYPE = {byte: idx for brackets in (OPENERS, CLOSERS) for idx, byte in enumerate(brackets)}
+IS_CLOSER = frozenset(CLOSERS)
+
+# translate() deletion table: every byte that is not one of SYMBOLS
+NON_SYMBOLS = bytes(b for b in range(256) if b not in SYMBOLS)
+
+# Slice size used when counting on a memory-mapped file
+CHUNK_SIZE = 1 << 20
+
+SymbolCounts = namedtuple('SymbolCounts', [
+    'round_open', 'round_close',
+    'square_open', 'square_close',
+    'curly_open', 'curly_close',
+    'backticks',
+])
+
+
+def symbol_histogram(buf):
+    """Return the SymbolCounts of a bytes-like buffer (bytes, memoryview, mmap) in one pass.
+
+    Each slice goes through a single translate() that deletes every non-symbol
+    byte; the seven counts then run over that residue, which is only as long
+    as the number of brackets and backticks in the file.
+    """
+    totals = [0] * len(SYMBOLS)
+    for start in range(0, len(buf), CHUNK_SIZE):
+        # Slicing an mmap copies only CHUNK_SIZE bytes at a time; bytes() turns
+        # a memoryview slice into something translate() works on
+        residue = bytes(buf[start:start + CHUNK_SIZE]).translate(None, NON_SYMBOLS)
+        if residue:
+            for idx, symbol in enumerate(SYMBOLS):
+                totals[idx] += residue.count(symbol)
+    return SymbolCounts(*totals)
@@ -1,20 +1,19 @@
 #!/usr/bin/env python3
-import os
-import re
+import argparse
+from array import array
 
-def count_brackets(file_path):
+from bracket_engine import BRACKET_PATTERN, BRACKET_TYPE, IS_CLOSER, OPENERS, symbol_histogram
+from file_discovery import (FileIdentities, add_discovery_arguments, discover_from_args,
+                            new_discovery_stats)
+from js_lexer import add_lexer_arguments
+from numpy_engine import HAVE_NUMPY, per_type_scan
+from pipeline import add_pipeline_arguments, content_digest, iter_buffers
+
+def count_brackets(buffer, lexer=False):
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            
-        # Count different bracket types
-        round_open = content.count('(')
-        round_close = content.count(')')
-        square_open = content.count('[')
-        square_close = content.count(']')
-        curly_open = content.count('{')
-        curly_close = content.count('}')
-        backticks = content.count('`')
+        # Count different bracket types directly on the raw bytes
+        (round_open, round_close, square_open, square_close,
+         curly_open, curly_close, backticks) = symbol_histogram(buffer.scan_data(lexer))
         
         issues = []
         
@@ -26,111 +25,137 @@ def count_brackets(file_path):
             issues.append(f'CURLY BRACKETS: {curly_open} open, {curly_close} close')
         if backticks % 2 != 0:
             issues.append(f'BACKTICKS: {backticks} (odd number)')
+        issues.extend(buffer.lexer_issues(lexer))
             
         return issues
         
     except Exception as e:
         return [f'ERROR reading file: {str(e)}']
 
-def find_bracket_position_issues(file_path):
+def find_bracket_position_issues(buffer, lexer=False):
     """Find line numbers where bracket issues might occur"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            
-        bracket_issues = []
-        round_stack = []
-        square_stack = []
-        curly_stack = []
-        
-        for line_num, line in enumerate(lines, 1):
-            for char_pos, char in enumerate(line):
-                if char == '(':
-                    round_stack.append((line_num, char_pos))
-                elif char == ')':
-                    if round_stack:
-                        round_stack.pop()
-                    else:
-                        bracket_issues.append(f'Line {line_num}, pos {char_pos}: Unmatched closing )')
-                        
-                elif char == '[':
-                    square_stack.append((line_num, char_pos))
-                elif char == ']':
-                    if square_stack:
-                        square_stack.pop()
-                    else:
-                        bracket_issues.append(f'Line {line_num}, pos {char_pos}: Unmatched closing ]')
-                        
-                elif char == '{':
-                    curly_stack.append((line_num, char_pos))
-                elif char == '}':
-                    if curly_stack:
-                        curly_stack.pop()
-                    else:
-                        bracket_issues.append(f'Line {line_num}, pos {char_pos}: Unmatched closing }}')
+        data = buffer.scan_data(lexer)
+        if HAVE_NUMPY:
+            unmatched, unclosed = per_type_scan(data)
+        else:
+            unmatched, unclosed = per_type_offsets(data)
         
-        # Check for unclosed brackets
-        for line_num, char_pos in round_stack:
-            bracket_issues.append(f'Line {line_num}, pos {char_pos}: Unclosed opening (')
-        for line_num, char_pos in square_stack:
-            bracket_issues.append(f'Line {line_num}, pos {char_pos}: Unclosed opening [')
-        for line_num, char_pos in curly_stack:
-            bracket_issues.append(f'Line {line_num}, pos {char_pos}: Unclosed opening {{')
+        # Line and column are only worked out for the reported brackets
+        positions = buffer.line_cols([offset for offset, _ in unmatched + unclosed])
+        bracket_issues = []
+        for offset, char in unmatched:
+            line_num, char_pos = positions[offset]
+            bracket_issues.append(f'Line {line_num}, pos {char_pos}: Unmatched closing {chr(char)}')
+        for offset, char in unclosed:
+            line_num, char_pos = positions[offset]
+            bracket_issues.append(f'Line {line_num}, pos {char_pos}: Unclosed opening {chr(char)}')
             
         return bracket_issues
         
     except Exception as e:
         return [f'ERROR: {str(e)}']
 
-# Check all JavaScript, TypeScript files
-target_files = []
-extensions = ['.js', '.ts', '.tsx']
+def per_type_offsets(data):
+    """(unmatched closers, unclosed openers) as (byte offset, bracket byte), one stack per bracket type"""
+    stacks = [array('Q') for _ in OPENERS]
+    unmatched = []
+    for match in BRACKET_PATTERN.finditer(data):
+        char = match.group()[0]
+        stack = stacks[BRACKET_TYPE[char]]
+        if char not in IS_CLOSER:
+            stack.append(match.start())
+        elif stack:
+            stack.pop()
+        else:
+            unmatched.append((match.start(), char))
+    unclosed = [(offset, opener) for opener, stack in zip(OPENERS, stacks) for offset in stack]
+    return unmatched, unclosed
 
-for root, dirs, files in os.walk('.'):
-    for file in files:
-        if any(file.endswith(ext) for ext in extensions):
-            target_files.append(os.path.join(root, file))
+def main():
+    parser = argparse.ArgumentParser(description='Umfassende Klammer-Pairing Überprüfung')
+    parser.add_argument('root', nargs='?', default='.', help='Startverzeichnis (Standard: .)')
+    add_discovery_arguments(parser)
+    add_pipeline_arguments(parser, jobs=False)
+    add_lexer_arguments(parser)
+    args = parser.parse_args()
 
-print('=== UMFASSENDE KLAMMER-PAIRING ÜBERPRÜFUNG ===\n')
-print(f'Überprüfe {len(target_files)} Dateien...\n')
+    # Check all JavaScript, TypeScript files
+    extensions = ['.js', '.ts', '.tsx']
+    stats = new_discovery_stats()
+    identities = FileIdentities()
+    target_files = list(discover_from_args(args, [(args.root, extensions)], stats, skip_hidden=False,
+                                           identities=identities))
+    alias_count = identities.alias_count()
 
-problems_found = False
-detailed_issues = {}
+    print('=== UMFASSENDE KLAMMER-PAIRING ÜBERPRÜFUNG ===\n')
+    print(f'Überprüfe {len(target_files) + alias_count} Dateien...')
+    print(f"Übersprungen: {stats['dirs_skipped']} Verzeichnisse, {stats['entries_skipped']} Einträge")
+    if alias_count:
+        print(f'Identische Dateien (Hardlink/Symlink): {alias_count} Pfade, nur einmal analysiert')
+    print()
 
-for file_path in target_files:
-    basic_issues = count_brackets(file_path)
-    position_issues = find_bracket_position_issues(file_path)
-    
-    if basic_issues or position_issues:
-        problems_found = True
-        detailed_issues[file_path] = {
-            'basic': basic_issues,
-            'positions': position_issues
-        }
-        print(f'❌ PROBLEME in: {file_path}')
-        for issue in basic_issues:
-            print(f'   - {issue}')
-        for issue in position_issues[:5]:  # Show first 5 position issues
-            print(f'   - {issue}')
-        if len(position_issues) > 5:
-            print(f'   - ... und {len(position_issues) - 5} weitere Positionsfehler')
-        print()
+    problems_found = False
+    detailed_issues = {}
+
+    # Results by content digest: copies (backup/, ConnectGlobalTemp/) are analysed once.
+    # The lexer reads the same bytes differently in a .tsx/.jsx file, so that is part of the key
+    results_by_digest = {}
+    deduplicated = 0
+
+    # Both analyses and the digest share one read of the file, done ahead in the background
+    for buffer in iter_buffers(target_files, args.read_ahead, prefetch=args.prefetch):
+        source_path = buffer.path
+        digest = content_digest(buffer)
+        key = (digest, args.lexer and buffer.jsx)
+        if digest is not None and key in results_by_digest:
+            basic_issues, position_issues = results_by_digest[key]
+            deduplicated += 1
+        else:
+            basic_issues = count_brackets(buffer, args.lexer)
+            position_issues = find_bracket_position_issues(buffer, args.lexer)
+            if digest is not None:
+                results_by_digest[key] = (basic_issues, position_issues)
+        
+        # Hard-linked and symlinked copies share the result of the first path
+        for file_path in identities.paths_for(source_path):
+            same_as = f' (= {source_path})' if file_path != source_path else ''
+            if basic_issues or position_issues:
+                problems_found = True
+                detailed_issues[file_path] = {
+                    'basic': basic_issues,
+                    'positions': position_issues
+                }
+                print(f'❌ PROBLEME in: {file_path}{same_as}')
+                for issue in basic_issues:
+                    print(f'   - {issue}')
+                for issue in position_issues[:5]:  # Show first 5 position issues
+                    print(f'   - {issue}')
+                if len(position_issues) > 5:
+                    print(f'   - ... und {len(position_issues) - 5} weitere Positionsfehler')
+                print()
+            else:
+                print(f'✅ OK: {file_path}{same_as}')
+
+    print('\n=== ZUSAMMENFASSUNG ===')
+    if deduplicated:
+        print(f'Inhaltsgleiche Dateien: {deduplicated} (Ergebnis wiederverwendet, nicht erneut analysiert)')
+    if not problems_found:
+        print('🎉 Alle Dateien haben korrektes Klammer-Pairing!')
     else:
-        print(f'✅ OK: {file_path}')
+        print(f'⚠️  KRITISCHE PROBLEME in {len(detailed_issues)} Dateien gefunden!')
+        print('\nDetaillierte Probleme:')
+        for file_path, issues in detailed_issues.items():
+            print(f'\n📁 {file_path}:')
+            if issues['basic']:
+                print('  Zählung:')
+                for issue in issues['basic']:
+                    print(f'    - {issue}')
+            if issues['positions']:
+                print('  Positionen:')
+                for issue in issues['positions']:
+                    print(f'    - {issue}')
+
 
-print('\n=== ZUSAMMENFASSUNG ===')
-if not problems_found:
-    print('🎉 Alle Dateien haben korrektes Klammer-Pairing!')
-else:
-    print(f'⚠️  KRITISCHE PROBLEME in {len(detailed_issues)} Dateien gefunden!')
-    print('\nDetaillierte Probleme:')
-    for file_path, issues in detailed_issues.items():
-        print(f'\n📁 {file_path}:')
-        if issues['basic']:
-            print('  Zählung:')
-            for issue in issues['basic']:
-                print(f'    - {issue}')
-        if issues['positions']:
-            print('  Positionen:')
-            for issue in issues['positions']:
-                print(f'    - {issue}')
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,79 +1,192 @@
+import argparse
 import os
-import glob
 import re
+from array import array
+from functools import partial
 
-def analyze_bracket_structure(filepath):
-    """Detailed bracket structure analysis"""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        bracket_stack = []
-        issues = []
-        line_issues = []
-        
-        for line_num, line in enumerate(lines, 1):
-            for char_pos, char in enumerate(line):
-                if char in '([{':
-                    bracket_stack.append({
-                        'char': char,
+from bracket_engine import BRACKET_PATTERN, BRACKET_TYPE, IS_CLOSER, OPENERS, SymbolCounts, symbol_histogram
+from file_buffer import char_columns, decode_text
+from file_discovery import add_discovery_arguments, discover_from_args
+from js_lexer import add_lexer_arguments, is_jsx, lex_chunks
+from numpy_engine import HAVE_NUMPY, nested_scan
+from pipeline import add_pipeline_arguments, run_checks
+from text_stream import iter_chunks, line_positions, read_lines, should_stream
+
+BRACKET_OR_NEWLINE = re.compile(rb'[()\[\]{}\n]')
+NEWLINE = ord('\n')
+# Line-level patterns worth a closer look, with their messages; none of them spans a line break
+COMMON_PATTERNS = [
+    # Multiple consecutive opening brackets without context
+    (re.compile(rb'[(\[{]{3}'), 'Multiple consecutive opening brackets'),
+    (re.compile(rb'[)\]}]{3}'), 'Multiple consecutive closing brackets'),
+    # Suspicious bracket patterns
+    (re.compile(rb'\)[^\S\n]*\[[^\S\n]*\{'), 'Complex bracket sequence )[{'),
+]
+# Blanks a ) [ { may be spread over within a line
+BLANKS = b' \t\r\v\f'
+
+def bracket_structure_offsets(data):
+    """Match the brackets of the raw bytes on one shared stack, returning the same as nested_scan"""
+    # Each open bracket is one integer: offset << 2 | type index
+    bracket_stack = array('Q')
+    closer_issues = []
+    for match in BRACKET_PATTERN.finditer(data):
+        char = match.group()[0]
+        if char not in IS_CLOSER:
+            bracket_stack.append(match.start() << 2 | BRACKET_TYPE[char])
+        elif not bracket_stack:
+            closer_issues.append((match.start(), char, None, None))
+        else:
+            # A mismatched opener is popped as well
+            packed = bracket_stack.pop()
+            if packed & 3 != BRACKET_TYPE[char]:
+                closer_issues.append((match.start(), char, packed >> 2, OPENERS[packed & 3]))
+    return closer_issues, [(packed >> 2, OPENERS[packed & 3]) for packed in bracket_stack]
+
+def bracket_structure_issues(buffer, lexer=False):
+    """Issue dicts for the shared-stack bracket check of a FileBuffer"""
+    data = buffer.scan_data(lexer)
+    if HAVE_NUMPY:
+        closer_issues, unclosed = nested_scan(data)
+    else:
+        closer_issues, unclosed = bracket_structure_offsets(data)
+    
+    # Line and column are only worked out for the brackets that are reported
+    positions = buffer.line_cols([offset for offset, _, _, _ in closer_issues] +
+                                 [open_offset for _, _, open_offset, _ in closer_issues if open_offset is not None] +
+                                 [offset for offset, _ in unclosed])
+    line_issues = []
+    for offset, char, open_offset, open_char in closer_issues:
+        line_num, char_pos = positions[offset]
+        if open_offset is None:
+            issue = f'Unmatched closing {chr(char)}'
+        else:
+            open_line, _ = positions[open_offset]
+            issue = f'Mismatched brackets: expected closing for {chr(open_char)} from line {open_line}, got {chr(char)}'
+        line_issues.append({
+            'line': line_num,
+            'pos': char_pos,
+            'issue': issue,
+            'context': buffer.context(line_num)
+        })
+    for offset, open_char in unclosed:
+        line_num, char_pos = positions[offset]
+        context = buffer.context(line_num)
+        line_issues.append({
+            'line': line_num,
+            'pos': char_pos,
+            'issue': f'Unclosed {chr(open_char)}',
+            'context': context[:50] + '...' if len(context) > 50 else context
+        })
+    return line_issues
+
+def bracket_structure_issues_streaming(path, lexer=False):
+    """Chunked bracket_structure_issues for files too large to load whole; returns (line_issues, SymbolCounts)"""
+    # Open brackets as byte column << 2 | type index, with their line numbers alongside
+    bracket_stack = array('Q')
+    bracket_lines = array('Q')
+    line_issues = []
+    line_num = 1
+    line_start = 0  # offset of the current line's start, relative to the current piece
+    totals = [0] * len(SymbolCounts._fields)
+    problems = []
+    
+    # The lexer always runs, for the template and JSX problems; positions stay byte
+    # columns until the reported lines are read back at the end
+    for raw, code in lex_chunks(iter_chunks(path), is_jsx(path), problems):
+        chunk = code if lexer else raw
+        totals = [total + count for total, count in zip(totals, symbol_histogram(chunk))]
+        for match in BRACKET_OR_NEWLINE.finditer(chunk):
+            char = match.group()[0]
+            byte_pos = match.start() - line_start
+            if char == NEWLINE:
+                line_num += 1
+                line_start = match.start() + 1
+            elif char not in IS_CLOSER:
+                bracket_stack.append(byte_pos << 2 | BRACKET_TYPE[char])
+                bracket_lines.append(line_num)
+            elif not bracket_stack:
+                line_issues.append({
+                    'line': line_num,
+                    'pos': byte_pos,
+                    'issue': f'Unmatched closing {chr(char)}'
+                })
+            else:
+                packed = bracket_stack.pop()
+                open_line = bracket_lines.pop()
+                if packed & 3 != BRACKET_TYPE[char]:
+                    line_issues.append({
                         'line': line_num,
-                        'pos': char_pos,
-                        'context': line.strip()[:50] + '...' if len(line.strip()) > 50 else line.strip()
+                        'pos': byte_pos,
+                        'issue': f'Mismatched brackets: expected closing for {chr(OPENERS[packed & 3])} from line {open_line}, got {chr(char)}'
                     })
-                elif char in ')]}':
-                    # Find matching opening bracket
-                    expected = {')', ']', '}'}[{')': 0, ']': 1, '}': 2}[char]]
-                    expected_open = '([{'[{')': 0, ']': 1, '}': 2}[char]]
-                    
-                    if not bracket_stack:
-                        line_issues.append({
-                            'line': line_num,
-                            'pos': char_pos,
-                            'issue': f'Unmatched closing {char}',
-                            'context': line.strip()
-                        })
-                    else:
-                        last_open = bracket_stack[-1]
-                        if last_open['char'] == expected_open:
-                            bracket_stack.pop()  # Correct match
-                        else:
-                            line_issues.append({
-                                'line': line_num,
-                                'pos': char_pos,
-                                'issue': f'Mismatched brackets: expected closing for {last_open["char"]} from line {last_open["line"]}, got {char}',
-                                'context': line.strip()
-                            })
-                            bracket_stack.pop()  # Remove mismatched bracket
-        
-        # Check for unclosed brackets
-        for unclosed in bracket_stack:
-            line_issues.append({
-                'line': unclosed['line'],
-                'pos': unclosed['pos'],
-                'issue': f'Unclosed {unclosed["char"]}',
-                'context': unclosed['context']
-            })
-        
-        # Check template literals (backticks)
-        content = ''.join(lines)
-        backtick_count = content.count('`')
-        if backtick_count % 2 != 0:
-            line_issues.append({
-                'line': 'multiple',
-                'pos': 'various',
-                'issue': f'Unmatched template literals (backticks): {backtick_count} total',
-                'context': 'Check template string literals'
-            })
-        
+        line_start -= len(chunk)
+    
+    for packed, open_line in zip(bracket_stack, bracket_lines):
+        line_issues.append({
+            'line': open_line,
+            'pos': packed >> 2,
+            'issue': f'Unclosed {chr(OPENERS[packed & 3])}',
+            'unclosed': True
+        })
+    
+    # Template and JSX problems, located with one more pass over the file
+    problem_positions = line_positions(path, (offset for offset, _ in problems))
+    for offset, problem in problems:
+        line_num, byte_pos = problem_positions[offset]
+        line_issues.append({
+            'line': line_num,
+            'pos': byte_pos,
+            'issue': problem,
+            'unclosed': True
+        })
+    
+    context_lines = read_lines(path, (issue['line'] for issue in line_issues))
+    byte_positions = {}
+    for issue in line_issues:
+        byte_positions.setdefault(issue['line'], []).append(issue['pos'])
+    columns = {line_num: char_columns(context_lines[line_num], positions)
+               for line_num, positions in byte_positions.items()}
+    contexts = {line_num: decode_text(raw_line).strip() for line_num, raw_line in context_lines.items()}
+    for issue in line_issues:
+        issue['pos'] = columns[issue['line']][issue['pos']]
+        context = contexts[issue['line']]
+        if issue.pop('unclosed', False) and len(context) > 50:
+            context = context[:50] + '...'
+        issue['context'] = context
+    return line_issues, SymbolCounts(*totals)
+
+def analyze_bracket_structure(buffer, lexer=False):
+    """Detailed bracket structure analysis of a FileBuffer"""
+    filepath = buffer.path
+    try:
+        if should_stream(buffer):
+            line_issues, counts = bracket_structure_issues_streaming(buffer.path, lexer)
+        else:
+            line_issues = bracket_structure_issues(buffer, lexer)
+            
+            # Check template literals and JSX tags: the lexer follows backticks, ${ }
+            # and element nesting exactly
+            problem_positions = buffer.line_cols([offset for offset, _ in buffer.syntax_problems])
+            for offset, problem in buffer.syntax_problems:
+                line_num, col = problem_positions[offset]
+                context = buffer.context(line_num)
+                line_issues.append({
+                    'line': line_num,
+                    'pos': col,
+                    'issue': problem,
+                    'context': context[:50] + '...' if len(context) > 50 else context
+                })
+            
+            counts = symbol_histogram(buffer.scan_data(lexer))
         return {
             'file': filepath,
             'issues': line_issues,
             'total_brackets': {
-                'round': (content.count('('), content.count(')')),
-                'square': (content.count('['), content.count(']')),
-                'curly': (content.count('{'), content.count('}')),
-                'backticks': backtick_count
+                'round': (counts.round_open, counts.round_close),
+                'square': (counts.square_open, counts.square_close),
+                'curly': (counts.curly_open, counts.curly_close),
+                'backticks': counts.backticks
             }
         }
         
@@ -84,49 +197,61 @@ def analyze_bracket_structure(filepath):
             'total_brackets': None
         }
 
-def find_common_patterns(filepath):
-    """Find common problematic patterns"""
-    patterns = []
+def pattern_lines_streaming(path):
+    """Sorted (line_num, COMMON_PATTERNS index) of every pattern found in a file read piece by piece"""
+    found = set()
+    tail = b''
+    line_num = 1  # line at the start of tail
+    for chunk in iter_chunks(path):
+        data = tail + chunk
+        for idx, (pattern, _) in enumerate(COMMON_PATTERNS):
+            match_line = line_num
+            pos = 0
+            match = pattern.search(data)
+            while match is not None:
+                match_line += data.count(b'\n', pos, match.start())
+                found.add((match_line, idx))
+                # One report per line and pattern, so go on with the next line
+                pos = data.find(b'\n', match.end())
+                match = pattern.search(data, pos) if pos >= 0 else None
+        # A run of three brackets may be cut after two, a ) [ { after the ) or the [
+        keep = max(len(data) - 2, 0)
+        trimmed = data.rstrip(BLANKS)
+        if trimmed.endswith(b'['):
+            trimmed = trimmed[:-1].rstrip(BLANKS)
+        if trimmed.endswith(b')'):
+            keep = min(keep, len(trimmed) - 1)
+        line_num += data.count(b'\n', 0, keep)
+        tail = data[keep:]
+    return sorted(found)
+
+def find_common_patterns(buffer):
+    """Find common problematic patterns in a FileBuffer"""
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-            lines = content.split('\n')
-        
-        # Check for common issues
-        for line_num, line in enumerate(lines, 1):
-            # Multiple consecutive opening brackets without context
-            if re.search(r'[(\[{]{3,}', line):
-                patterns.append(f'Line {line_num}: Multiple consecutive opening brackets')
-            
-            # Multiple consecutive closing brackets
-            if re.search(r'[)\]}]{3,}', line):
-                patterns.append(f'Line {line_num}: Multiple consecutive closing brackets')
-            
-            # Suspicious bracket patterns
-            if re.search(r'\)\s*\[\s*\{', line):
-                patterns.append(f'Line {line_num}: Complex bracket sequence )[{{')
-            
-            # Template literal with nested brackets
-            if '`' in line and ('{' in line or '[' in line or '(' in line):
-                if line.count('`') == 1:  # Incomplete template literal on this line
-                    patterns.append(f'Line {line_num}: Possible incomplete template literal')
-        
-        return patterns
+        if should_stream(buffer):
+            found = pattern_lines_streaming(buffer.path)
+        else:
+            found = [(line_num, idx) for line_num, line in enumerate(buffer.lines, 1)
+                     for idx, (pattern, _) in enumerate(COMMON_PATTERNS) if pattern.search(line)]
+        return [f'Line {line_num}: {COMMON_PATTERNS[idx][1]}' for line_num, idx in found]
         
     except Exception as e:
         return [f'ERROR analyzing patterns: {str(e)}']
 
+def analyze_file(buffer, lexer=False):
+    """Run both analyses on one file, sharing a single read"""
+    return analyze_bracket_structure(buffer, lexer), find_common_patterns(buffer)
+
 def main():
-    # File patterns to check
-    file_patterns = [
-        'backend/src/**/*.js',
-        'src/**/*.ts',
-        'src/**/*.tsx'
-    ]
-    
-    all_files = []
-    for pattern in file_patterns:
-        all_files.extend(glob.glob(pattern, recursive=True))
+    parser = argparse.ArgumentParser(description='Detailed bracket structure analysis')
+    add_discovery_arguments(parser)
+    add_pipeline_arguments(parser)
+    add_lexer_arguments(parser)
+    args = parser.parse_args()
+
+    # Collect all files to check in a single pass per source root
+    sizes = {}
+    all_files = list(discover_from_args(args, sizes=sizes))
     
     print("=== DETAILED BRACKET STRUCTURE ANALYSIS ===\n")
     print(f"Analyzing {len(all_files)} files for bracket issues...\n")
@@ -134,9 +259,9 @@ def main():
     files_with_issues = []
     total_issues = 0
     
-    for filepath in sorted(all_files):
-        result = analyze_bracket_structure(filepath)
-        patterns = find_common_patterns(filepath)
+    check = partial(analyze_file, lexer=args.lexer)
+    for filepath, (result, patterns) in run_checks(check, all_files, args.jobs, sizes,
+                                                   args.read_ahead, args.prefetch):
         
         has_issues = bool(result['issues'] or patterns)
         
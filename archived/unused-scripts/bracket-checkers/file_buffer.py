@@ -0,0 +1,235 @@
+import bisect
+import mmap
+import os
+import re
+import stat
+from array import array
+
+from js_lexer import code_only, is_jsx, syntax_problems
+
+HAVE_FADVISE = hasattr(os, 'posix_fadvise')
+
+# Universal newlines: \r\n, a lone \r and \n each end a line
+LINE_BREAK = re.compile(rb'\r\n?|\n')
+
+
+def decode_text(raw):
+    """Decode raw UTF-8 for display; invalid bytes become U+FFFD instead of failing"""
+    return str(raw, 'utf-8', 'replace')
+
+
+def char_columns(raw, positions, start=0):
+    """{position: 0-based character column} for byte positions in raw counted from start.
+
+    Positions are taken in ascending order and each column is carried forward
+    from the previous one, so a long line is decoded once in total rather than
+    once per position. Every position must be that of an ASCII byte, which
+    always starts a character, even in invalid UTF-8.
+    """
+    columns = {}
+    col = 0
+    previous = start
+    for pos in sorted(set(positions)):
+        col += len(decode_text(raw[previous:pos]))
+        previous = pos
+        columns[pos] = col
+    return columns
+
+
+def advise_sequential(fd):
+    """Tell the kernel a file will be read front to back, so it reads ahead aggressively"""
+    if HAVE_FADVISE:
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+
+def will_need(path):
+    """Ask the kernel to start reading path into the page cache in the background"""
+    if not HAVE_FADVISE:
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class FileBuffer:
+    """The contents of one source file, read once and shared by every analysis.
+
+    The raw bytes are loaded on first access: regular files are memory-mapped,
+    anything else (pipes, devices) is read in one go, and callers that already
+    hold the bytes (staged blobs, git history) pass them in directly. The line
+    list and the line-offset index are derived lazily from those bytes and cached,
+    so a file is never opened twice.
+
+    Every symbol the checks look at is ASCII, so they run on the bytes and never
+    decode the whole file; files that are not valid UTF-8 are analysed like any
+    other. Only the columns and lines that end up in a report are decoded.
+
+    Loading happens inside the analysis functions, which turn read errors into
+    their usual 'ERROR ...' results.
+    """
+
+    def __init__(self, path, data=None):
+        self.path = path
+        self._data = data
+        self._mmap = None
+        self._code = None
+        self._problems = None
+        self._lines = None
+        self._line_offsets = None
+        self._contexts = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._code = None
+        self._problems = None
+        self._contexts = {}
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+            self._data = None
+        elif isinstance(self._data, memoryview):
+            # The view points into a recycled read buffer and must not outlive the analysis
+            try:
+                self._data.release()
+            except BufferError:
+                pass
+            self._data = None
+
+    @property
+    def data(self):
+        """The raw bytes (bytes, a memoryview or a read-only mmap)"""
+        if self._data is None:
+            self._data = self._load()
+        return self._data
+
+    @property
+    def size(self):
+        """Size in bytes, taken from the loaded data or else from a stat of the file"""
+        if self._data is not None:
+            return len(self._data)
+        return os.stat(self.path).st_size
+
+    def _load(self):
+        with open(self.path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            if stat.S_ISREG(st.st_mode) and st.st_size > 0:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    self._mmap.madvise(mmap.MADV_SEQUENTIAL)
+                return self._mmap
+            return f.read()
+
+    @property
+    def jsx(self):
+        """True if the file is lexed with JSX syntax, decided by its extension"""
+        return is_jsx(self.path)
+
+    @property
+    def code(self):
+        """The raw bytes with strings, comments, regex literals and JSX text blanked out (see js_lexer)"""
+        if self._code is None:
+            problems = []
+            self._code = code_only(self.data, self.jsx, problems)
+            self._problems = problems
+        return self._code
+
+    @property
+    def syntax_problems(self):
+        """(offset, message) of unbalanced template literals and JSX elements, found by the lexer.
+
+        Taken from the scan that produced code if there was one, so the file
+        is lexed once either way.
+        """
+        if self._problems is None:
+            self._problems = syntax_problems(self.data, self.jsx)
+        return self._problems
+
+    def scan_data(self, lexer=False):
+        """What the bracket checks scan: code if lexer is set, else the raw bytes"""
+        return self.code if lexer else self.data
+
+    def format_syntax_problems(self):
+        """syntax_problems as 'Line N, pos C: message' strings, in file order"""
+        problems = sorted(self.syntax_problems)
+        positions = self.line_cols([offset for offset, _ in problems])
+        return [f'Line {positions[offset][0]}, pos {positions[offset][1]}: {message}'
+                for offset, message in problems]
+
+    def lexer_issues(self, lexer=False):
+        """The syntax problems the bracket checks report: formatted if lexer is set, else none"""
+        # A template or JSX element the lexer could not close hides the brackets after it
+        return self.format_syntax_problems() if lexer else []
+
+    @property
+    def lines(self):
+        """The raw lines without line endings, split like text.split('\\n') after universal newlines"""
+        if self._lines is None:
+            data = bytes(self.data)
+            lines = data.splitlines()
+            if not data or data.endswith((b'\n', b'\r')):
+                lines.append(b'')
+            self._lines = lines
+        return self._lines
+
+    @property
+    def line_offsets(self):
+        """Byte offset at which each line starts, as a compact array"""
+        if self._line_offsets is None:
+            data = self.data
+            offsets = array('I' if len(data) <= 0xFFFFFFFF else 'Q', [0])
+            offsets.extend(match.end() for match in LINE_BREAK.finditer(data))
+            self._line_offsets = offsets
+        return self._line_offsets
+
+    def line_col(self, offset):
+        """1-based line number and 0-based character column of a byte offset"""
+        return self.line_cols((offset,))[offset]
+
+    def line_cols(self, offsets):
+        """{offset: (line, column)} for byte offsets of ASCII bytes, like line_col.
+
+        Offsets on the same line share one left-to-right decode (see
+        char_columns), so resolving many brackets on a minified one-line file
+        stays linear.
+        """
+        line_offsets = self.line_offsets
+        by_line = {}
+        for offset in offsets:
+            by_line.setdefault(bisect.bisect_right(line_offsets, offset), []).append(offset)
+        positions = {}
+        for line_num, line_positions in by_line.items():
+            columns = char_columns(self.data, line_positions, line_offsets[line_num - 1])
+            for offset, col in columns.items():
+                positions[offset] = (line_num, col)
+        return positions
+
+    def line(self, line_num):
+        """Decoded text of the 1-based line line_num without its line ending"""
+        offsets = self.line_offsets
+        start = offsets[line_num - 1]
+        end = offsets[line_num] if line_num < len(offsets) else len(self.data)
+        return decode_text(bytes(self.data[start:end]).rstrip(b'\r\n'))
+
+    def context(self, line_num):
+        """The 1-based line line_num stripped of surrounding whitespace, as shown in reports.
+
+        Cached per line, since a long line can carry many reported brackets.
+        """
+        if line_num not in self._contexts:
+            self._contexts[line_num] = self.line(line_num).strip()
+        return self._contexts[line_num]
@@ -0,0 +1,246 @@
+import os
+
+from git_source import GitError, tracked_files
+from ignore_rules import IgnoreMatcher
+
+# Directory names that never contain sources we want to check
+DEFAULT_EXCLUDE_NAMES = {
+    '.git',
+    'node_modules',
+    'build',
+    '.gradle',
+    'Pods',
+    'DerivedData',
+    '__pycache__',
+}
+
+# Native project trees; a leading / anchors the entry to the scan root
+DEFAULT_EXCLUDE_PATHS = {
+    '/android',
+    '/ios',
+    '/ConnectGlobalTemp/android',
+    '/ConnectGlobalTemp/ios',
+}
+
+DEFAULT_EXCLUDES = DEFAULT_EXCLUDE_NAMES | DEFAULT_EXCLUDE_PATHS
+
+# (root, extensions) pairs checked by bracket_check, detailed_bracket_check and final_bracket_check
+SOURCE_SPECS = [
+    ('backend/src', ('.js',)),
+    ('src', ('.ts', '.tsx')),
+]
+
+
+def new_discovery_stats():
+    """Counters filled in while walking a tree"""
+    return {
+        'dirs_scanned': 0,
+        'dirs_skipped': 0,
+        'entries_skipped': 0,
+    }
+
+
+def split_excludes(excludes):
+    """Split an exclude set into directory names and root-relative paths.
+
+    'node_modules' excludes every directory with that name, '/android' or
+    'src/generated' only the directory at that path below the scan root.
+    """
+    names = set()
+    paths = set()
+    for exclude in excludes:
+        if '/' in exclude.rstrip('/'):
+            paths.add(exclude.strip('/'))
+        else:
+            names.add(exclude.strip('/'))
+    return names, paths
+
+
+def iter_entries(root, extensions, excludes=DEFAULT_EXCLUDES, stats=None, skip_hidden=False,
+                 ignore=None, follow_links=False):
+    """Yield os.DirEntry objects for files below root that end with one of extensions.
+
+    Excluded and ignored directories are pruned before they are opened, so nothing
+    below them is ever read. Entries come out in the same order os.walk() would
+    produce them: the files of a directory first, then its subdirectories depth-first.
+    With skip_hidden, names starting with a dot are ignored like glob.glob() does.
+    ignore is an optional ignore_rules.IgnoreMatcher; the ignore files of each
+    directory are loaded from the entries already read before its children are matched.
+    With follow_links, symlinked directories are descended into as well; every
+    directory is then identified by (st_dev, st_ino) and a link back to one of
+    its own ancestors is not followed, so link cycles terminate.
+    """
+    extensions = tuple(extensions)
+    exclude_names, exclude_paths = split_excludes(excludes)
+    if stats is None:
+        stats = new_discovery_stats()
+    if ignore is not None:
+        ignore_base = ignore.relative(root)
+        ignore.load_parents(ignore_base)
+
+    # Stack of (directory path, path relative to root, identities of its ancestors)
+    pending = [(root, '', ())]
+    while pending:
+        dir_path, rel_dir, ancestors = pending.pop()
+        try:
+            if follow_links:
+                dir_stat = os.stat(dir_path)
+                dir_key = (dir_stat.st_dev, dir_stat.st_ino)
+                if dir_key in ancestors:
+                    stats['dirs_skipped'] += 1
+                    continue
+                ancestors += (dir_key,)
+            with os.scandir(dir_path) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        stats['dirs_scanned'] += 1
+
+        if ignore is not None:
+            ignore_dir = join_rel(ignore_base, rel_dir)
+            ignore.load_dir(ignore_dir, {entry.name for entry in entries})
+
+        subdirs = []
+        for entry in entries:
+            if skip_hidden and entry.name.startswith('.'):
+                stats['entries_skipped'] += 1
+                continue
+            # is_dir()/is_file() use the d_type cached on the DirEntry, no extra stat call
+            is_dir = entry.is_dir(follow_symlinks=follow_links)
+            if ignore is not None and ignore.is_ignored(join_rel(ignore_dir, entry.name), is_dir):
+                stats['dirs_skipped' if is_dir else 'entries_skipped'] += 1
+            elif is_dir:
+                rel_path = join_rel(rel_dir, entry.name)
+                if entry.name in exclude_names or rel_path in exclude_paths:
+                    stats['dirs_skipped'] += 1
+                else:
+                    subdirs.append((entry.path, rel_path, ancestors))
+            elif entry.name.endswith(extensions) and entry.is_file():
+                yield entry
+            else:
+                stats['entries_skipped'] += 1
+
+        pending.extend(reversed(subdirs))
+
+
+def join_rel(rel_dir, name):
+    """Join a '/'-separated relative directory and a name; '' is the root"""
+    return f'{rel_dir}/{name}' if rel_dir else name
+
+
+class FileIdentities:
+    """(st_dev, st_ino) of discovered files and the alias paths that lead to each.
+
+    A file reachable through hard links or symlinks is yielded by discovery only
+    under the first path it was found at; the other paths end up in aliases.
+    """
+
+    def __init__(self):
+        self.first_paths = {}
+        self.aliases = {}
+
+    def register(self, st, path):
+        """Record path for the file described by st; True if it was not seen before"""
+        key = (st.st_dev, st.st_ino)
+        first_path = self.first_paths.setdefault(key, path)
+        if first_path == path:
+            return True
+        self.aliases.setdefault(first_path, []).append(path)
+        return False
+
+    def paths_for(self, path):
+        """The discovered path followed by all of its aliases"""
+        return [path] + self.aliases.get(path, [])
+
+    def alias_count(self):
+        return sum(len(paths) for paths in self.aliases.values())
+
+
+def walk_files(root, extensions, excludes=DEFAULT_EXCLUDES, stats=None, skip_hidden=False,
+               ignore=None, sizes=None, identities=None, follow_links=False):
+    """Yield paths of files below root that end with one of extensions.
+
+    If sizes is a dict, the size of every yielded file is stored in it, taken
+    from the DirEntry's stat so the scheduler does not have to stat again.
+    If identities is a FileIdentities, files already seen under another path
+    are recorded as aliases and not yielded again.
+    """
+    for entry in iter_entries(root, extensions, excludes, stats, skip_hidden, ignore, follow_links):
+        if identities is not None and not identities.register(entry.stat(), entry.path):
+            continue
+        if sizes is not None:
+            sizes[entry.path] = entry.stat().st_size
+        yield entry.path
+
+
+def group_specs(specs):
+    """Merge (root, extensions) pairs so every root appears once with all its extensions"""
+    roots = {}
+    for root, extensions in specs:
+        merged = roots.setdefault(os.path.normpath(root), [])
+        for ext in extensions:
+            if ext not in merged:
+                merged.append(ext)
+    return list(roots.items())
+
+
+def discover_sources(specs=SOURCE_SPECS, excludes=DEFAULT_EXCLUDES, stats=None, ignore=None,
+                     skip_hidden=True, sizes=None, identities=None, follow_links=False):
+    """Lazily yield source file paths for specs, walking each root exactly once.
+
+    Replaces one glob.glob('<root>/**/*<ext>', recursive=True) call per pattern:
+    all extensions of a root are matched during the same traversal.
+    """
+    for root, extensions in group_specs(specs):
+        yield from walk_files(root, extensions, excludes, stats, skip_hidden, ignore, sizes,
+                              identities, follow_links)
+
+
+def add_discovery_arguments(parser):
+    """Register the file discovery options shared by all checker scripts"""
+    group = parser.add_argument_group('file discovery')
+    group.add_argument('--from-git', action='store_true',
+                       help='take the file list from the git index (git ls-files) instead of '
+                            'walking the disk')
+    group.add_argument('--exclude', action='append', default=[], metavar='DIR',
+                       help='skip directories with this name, or this path relative to the '
+                            'scan root when it contains a /')
+    group.add_argument('--no-default-excludes', action='store_true',
+                       help='do not skip .git, node_modules, build output and native project trees')
+    group.add_argument('--follow-links', action='store_true',
+                       help='descend into symlinked directories')
+    group.add_argument('--no-gitignore', action='store_true',
+                       help='do not prune paths ignored by .gitignore files')
+    group.add_argument('--eslintignore', action='store_true',
+                       help='also prune paths listed in .eslintignore files')
+
+
+def excludes_from_args(args):
+    excludes = set(args.exclude)
+    if not args.no_default_excludes:
+        excludes |= DEFAULT_EXCLUDES
+    return excludes
+
+
+def ignore_from_args(args, root='.'):
+    """Return an IgnoreMatcher according to the command line, or None"""
+    if args.no_gitignore:
+        return None
+    return IgnoreMatcher.for_root(root, eslintignore=args.eslintignore)
+
+
+def discover_from_args(args, specs=SOURCE_SPECS, stats=None, skip_hidden=True, sizes=None,
+                       identities=None):
+    """File paths for specs according to add_discovery_arguments() options.
+
+    With --from-git the list comes from the git index and no directory is walked;
+    the exclude and ignore options only apply to the disk walk.
+    """
+    if args.from_git:
+        try:
+            return list(tracked_files(group_specs(specs)))
+        except GitError as e:
+            raise SystemExit(f'error: {e}')
+    ignore = ignore_from_args(args, specs[0][0])
+    return discover_sources(specs, excludes_from_args(args), stats, ignore, skip_hidden, sizes,
+                            identities, args.follow_links)
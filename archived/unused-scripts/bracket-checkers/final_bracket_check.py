@@ -1,22 +1,25 @@
+import argparse
 import os
-import glob
 import re
+from functools import partial
 
-def check_file_detailed(filepath):
-    """Check file for bracket pairing and common issues"""
+from bracket_engine import symbol_histogram
+from file_buffer import FileBuffer
+from file_discovery import SOURCE_SPECS, add_discovery_arguments, discover_from_args, group_specs
+from git_source import (CatFileBatch, GitError, changed_files, file_history, first_bad_commit,
+                        staged_contents, staged_files)
+from js_lexer import add_lexer_arguments, is_jsx
+from pipeline import add_pipeline_arguments, run_checks
+
+def check_file_detailed(buffer, lexer=False):
+    """Check a FileBuffer for bracket pairing and common issues"""
+    filepath = buffer.path
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-            lines = content.split('\n')
+        lines = buffer.lines
         
         # Basic bracket counts
-        round_open = content.count('(')
-        round_close = content.count(')')
-        square_open = content.count('[')
-        square_close = content.count(']')
-        curly_open = content.count('{')
-        curly_close = content.count('}')
-        backticks = content.count('`')
+        (round_open, round_close, square_open, square_close,
+         curly_open, curly_close, backticks) = symbol_histogram(buffer.scan_data(lexer))
         
         issues = []
         patterns = []
@@ -30,16 +33,17 @@ def check_file_detailed(filepath):
             issues.append(f'Curly brackets mismatch: {curly_open} open vs {curly_close} close')
         if backticks % 2 != 0:
             issues.append(f'Template literals mismatch: {backticks} backticks (should be even)')
+        issues.extend(buffer.lexer_issues(lexer))
         
         # Check for potential problematic patterns
         for line_num, line in enumerate(lines, 1):
             # Multiple consecutive brackets (often indicates minified or complex code - not necessarily bad)
-            if re.search(r'[)\]}]{4,}', line):
+            if re.search(rb'[)\]}]{4,}', line):
                 patterns.append(f'Line {line_num}: Many consecutive closing brackets (possibly normal in complex structures)')
             
             # Unmatched quotes that might affect bracket parsing
-            single_quotes = line.count("'") - line.count("\\'")
-            double_quotes = line.count('"') - line.count('\\"')
+            single_quotes = line.count(b"'") - line.count(b"\\'")
+            double_quotes = line.count(b'"') - line.count(b'\\"')
             if single_quotes % 2 != 0:
                 patterns.append(f'Line {line_num}: Unmatched single quotes')
             if double_quotes % 2 != 0:
@@ -65,26 +69,101 @@ def check_file_detailed(filepath):
             'bracket_counts': None
         }
 
-def main():
-    file_patterns = [
-        'backend/src/**/*.js',
-        'src/**/*.ts',
-        'src/**/*.tsx'
-    ]
+def blob_is_critical(data, lexer=False, path=None):
+    """True if the given contents of path would be reported as [CRITICAL]"""
+    return bool(check_file_detailed(FileBuffer(path, data), lexer)['critical_issues'])
+
+def bisect_files(args):
+    """Report the first commit in which each file started failing the check"""
+    check = partial(check_file_detailed, lexer=args.lexer)
+    paths = args.paths
+    if not paths:
+        paths = [filepath for filepath, result
+                 in run_checks(check, discover_from_args(args), args.jobs,
+                               read_ahead=args.read_ahead, prefetch=args.prefetch)
+                 if result['critical_issues']]
+    
+    print("=== BRACKET BISECT ===")
+    print(f"Bisecting history of {len(paths)} files up to {args.rev}...\n")
     
-    all_files = []
-    for pattern in file_patterns:
-        all_files.extend(glob.glob(pattern, recursive=True))
+    # Analysis results are keyed by blob SHA and shared between all files; the
+    # lexer reads the same blob differently in a .tsx/.jsx file, so those get their own
+    caches = {False: {}, True: {}}
+    with CatFileBatch() as batch, CatFileBatch(check_only=True) as check_batch:
+        for path in paths:
+            history = file_history(path, args.rev)
+            is_bad = partial(blob_is_critical, lexer=args.lexer, path=path)
+            first_bad, analysed = first_bad_commit(path, history, is_bad, batch, check_batch,
+                                                   caches[args.lexer and is_jsx(path)])
+            if first_bad is None:
+                print(f"[GOOD] {path}: no critical issues at {args.rev}")
+            else:
+                commit, subject = history[first_bad]
+                print(f"[FIRST BAD] {path}: {commit[:12]} {subject}")
+            print(f"   {analysed} of {len(history)} commits analysed")
+    
+    print(f"\nBlobs analysed in total: {sum(len(cache) for cache in caches.values())}")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Final bracket pairing report')
+    parser.add_argument('--since', metavar='REV',
+                        help='only check files changed since REV (plus untracked files)')
+    parser.add_argument('--staged', action='store_true',
+                        help='check the staged contents of staged files (pre-commit mode)')
+    add_discovery_arguments(parser)
+    add_pipeline_arguments(parser)
+    add_lexer_arguments(parser)
+    subparsers = parser.add_subparsers(dest='command')
+    bisect_parser = subparsers.add_parser(
+        'bisect', help='find the commit that introduced the critical issues of each file')
+    bisect_parser.add_argument('paths', nargs='*',
+                               help='files to bisect (default: all files with critical issues)')
+    bisect_parser.add_argument('--rev', default='HEAD',
+                               help='newest commit to search from (default: HEAD)')
+    args = parser.parse_args()
+
+    if args.command == 'bisect':
+        try:
+            return bisect_files(args)
+        except GitError as e:
+            raise SystemExit(f'error: {e}')
+
+    check = partial(check_file_detailed, lexer=args.lexer)
+    sizes = {}
+    if args.staged or args.since:
+        try:
+            if args.staged:
+                all_files = sorted(staged_files(group_specs(SOURCE_SPECS)))
+            else:
+                all_files = list(changed_files(group_specs(SOURCE_SPECS), args.since))
+        except GitError as e:
+            raise SystemExit(f'error: {e}')
+    else:
+        # Collect all files to check in a single pass per source root
+        all_files = list(discover_from_args(args, sizes=sizes))
     
     print("=== FINAL BRACKET PAIRING REPORT ===")
-    print(f"Checking {len(all_files)} files for bracket issues...\n")
+    if args.staged:
+        print(f"Checking {len(all_files)} staged files for bracket issues...\n")
+    elif args.since:
+        print(f"Checking {len(all_files)} files changed since {args.since} for bracket issues...\n")
+    else:
+        print(f"Checking {len(all_files)} files for bracket issues...\n")
     
     critical_files = []
     info_files = []
     clean_files = []
     
-    for filepath in sorted(all_files):
-        result = check_file_detailed(filepath)
+    if args.staged:
+        # All blobs stream through one git cat-file --batch process
+        results = ((filepath, check(FileBuffer(filepath, data)))
+                   for filepath, data in zip(all_files, staged_contents(all_files)))
+    else:
+        results = run_checks(check, all_files, args.jobs, sizes,
+                             args.read_ahead, args.prefetch)
+    
+    for filepath, result in results:
         
         if result['critical_issues']:
             critical_files.append(result)
@@ -0,0 +1,218 @@
+import os
+import subprocess
+import threading
+
+
+class GitError(RuntimeError):
+    """A git command failed or git is not available"""
+
+
+def run_git(args, cwd=None):
+    """Run git with args and return its raw stdout bytes"""
+    try:
+        result = subprocess.run(['git', *args], cwd=cwd, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, check=False)
+    except OSError as e:
+        raise GitError(f'could not run git: {e}') from e
+    if result.returncode != 0:
+        message = result.stderr.decode('utf-8', 'replace').strip()
+        raise GitError(f"git {' '.join(args)} failed: {message}")
+    return result.stdout
+
+
+def split_nul(output):
+    """Split NUL-delimited git output into str paths"""
+    return [os.fsdecode(raw) for raw in output.split(b'\0') if raw]
+
+
+def filter_paths(paths, roots):
+    """Yield paths that lie below one of roots and end with one of its extensions.
+
+    roots is a list of (root, extensions) as returned by file_discovery.group_specs().
+    Paths are yielded in the same form the disk walker produces (root joined with
+    the path below it), so reports do not depend on the file source.
+    """
+    prefixes = []
+    for root, extensions in roots:
+        prefix = '' if root == '.' else root.replace(os.sep, '/') + '/'
+        prefixes.append((prefix, root, tuple(extensions)))
+
+    for path in paths:
+        for prefix, root, extensions in prefixes:
+            if path.startswith(prefix) and path.endswith(extensions):
+                yield os.path.join(root, path[len(prefix):])
+                break
+
+
+def tracked_files(roots):
+    """Yield files tracked in the git index for roots, without touching the working tree.
+
+    One 'git ls-files -z' call covers all roots; extension filtering happens in memory.
+    """
+    pathspecs = [root for root, _ in roots]
+    output = run_git(['ls-files', '-z', '--', *pathspecs])
+    yield from filter_paths(split_nul(output), roots)
+
+
+def changed_files(roots, rev):
+    """Yield files below roots that changed since rev, plus untracked ones.
+
+    Covers committed, staged and unstaged changes between rev and the working tree.
+    Deleted files are left out since there is nothing left to check.
+    """
+    pathspecs = [root for root, _ in roots]
+    changed = split_nul(run_git(['diff', '--name-only', '-z', '--relative', '--diff-filter=d',
+                                 '--end-of-options', rev, '--', *pathspecs]))
+    untracked = split_nul(run_git(['ls-files', '-z', '--others', '--exclude-standard',
+                                   '--', *pathspecs]))
+    # dict.fromkeys keeps the order and drops paths reported by both commands
+    yield from filter_paths(dict.fromkeys(changed + untracked), roots)
+
+
+def staged_files(roots):
+    """Yield files below roots that are added, copied, modified or renamed in the index"""
+    pathspecs = [root for root, _ in roots]
+    output = run_git(['diff', '--cached', '--name-only', '-z', '--relative', '--diff-filter=ACMR',
+                      '--', *pathspecs])
+    yield from filter_paths(split_nul(output), roots)
+
+
+def index_object_name(path):
+    """Object name of the staged blob for a path relative to the current directory"""
+    return ':./' + path.replace(os.sep, '/')
+
+
+class CatFileBatch:
+    """One long-lived 'git cat-file --batch' process serving many blob reads.
+
+    Object names are written to its stdin and the contents read back from stdout,
+    so any number of blobs costs a single process spawn. With check_only the
+    process runs --batch-check and only (sha, None) is returned, which is cheap
+    enough to resolve the blob SHAs of a whole file history up front.
+    """
+
+    def __init__(self, cwd=None, check_only=False):
+        self.check_only = check_only
+        option = '--batch-check' if check_only else '--batch'
+        try:
+            self.process = subprocess.Popen(['git', 'cat-file', option], cwd=cwd,
+                                            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        except OSError as e:
+            raise GitError(f'could not run git: {e}') from e
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.process.stdin and not self.process.stdin.closed:
+            self.process.stdin.close()
+        self.process.wait()
+
+    def _read_response(self):
+        """Read one response; returns (sha, data) or (None, None) for a missing object or non-blob"""
+        header = self.process.stdout.readline()
+        if not header:
+            raise GitError('git cat-file --batch exited unexpectedly')
+        # '<name> missing' or '<name> ambiguous', where the name may itself contain spaces
+        if header.endswith((b' missing\n', b' ambiguous\n')):
+            return None, None
+        sha, kind, size = header.split()
+        if not self.check_only:
+            data = self.process.stdout.read(int(size))
+            self.process.stdout.read(1)  # trailing newline
+        if kind != b'blob':
+            # A path that names a directory or submodule at this commit
+            return None, None
+        return sha.decode('ascii'), None if self.check_only else data
+
+    def get(self, name):
+        """Return (sha, data) for one object name"""
+        self.process.stdin.write(name.encode('utf-8') + b'\n')
+        self.process.stdin.flush()
+        return self._read_response()
+
+    def iter_objects(self, names):
+        """Yield (sha, data) for every name, in order.
+
+        The names are written from a helper thread while responses are read here,
+        so requests and replies stream through the pipes without a round trip
+        per object and without either side filling up and blocking.
+        """
+        names = list(names)
+
+        def write_names():
+            for name in names:
+                self.process.stdin.write(name.encode('utf-8') + b'\n')
+            self.process.stdin.flush()
+
+        writer = threading.Thread(target=write_names, daemon=True)
+        writer.start()
+        for _ in names:
+            yield self._read_response()
+        writer.join()
+
+
+def staged_contents(paths):
+    """Yield the staged bytes of each path, in order"""
+    paths = list(paths)
+    with CatFileBatch() as batch:
+        for path, (sha, data) in zip(paths, batch.iter_objects(map(index_object_name, paths))):
+            if sha is None:
+                raise GitError(f'{path} is not in the index')
+            yield data
+
+
+def file_history(path, rev='HEAD'):
+    """Return [(commit, subject)] of commits up to rev that touched path, oldest first"""
+    output = run_git(['log', '--reverse', '--format=%H %s', rev, '--', path])
+    history = []
+    for line in output.decode('utf-8', 'replace').splitlines():
+        commit, _, subject = line.partition(' ')
+        history.append((commit, subject))
+    return history
+
+
+def first_bad_commit(path, history, is_bad, batch, check_batch, cache):
+    """Binary search history (oldest first) for the first commit where path is bad.
+
+    The blob SHA of path at every commit is resolved in one streamed pass through
+    check_batch; contents are then fetched through batch only for the O(log n)
+    commits the search visits. cache maps blob SHA to the is_bad(data) verdict,
+    so identical blobs, in this history or another file's, are analysed once.
+    A commit where the file does not exist counts as good.
+
+    Returns (index of the first bad commit or None if the last one is good,
+    number of blobs analysed).
+    """
+    names = [f'{commit}:./{path}' for commit, _ in history]
+    shas = [sha for sha, _ in check_batch.iter_objects(names)]
+    analysed = 0
+
+    def bad_at(idx):
+        nonlocal analysed
+        sha = shas[idx]
+        if sha is None:
+            return False
+        if sha not in cache:
+            _, data = batch.get(sha)
+            if data is None:
+                # Never hand None to is_bad, which would fall back to reading the disk
+                return False
+            cache[sha] = is_bad(data)
+            analysed += 1
+        return cache[sha]
+
+    if not history or not bad_at(len(history) - 1):
+        return None, analysed
+
+    lo, hi = 0, len(history) - 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if bad_at(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo, analysed
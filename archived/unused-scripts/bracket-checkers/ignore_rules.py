@@ -0,0 +1,220 @@
+import os
+import re
+
+GITIGNORE = '.gitignore'
+ESLINTIGNORE = '.eslintignore'
+
+
+def glob_to_regex(pattern):
+    """Translate one gitignore glob (without leading ! or trailing /) into a regex string"""
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+    parts = pattern.split('/')
+
+    regex = '' if anchored else '(?:.*/)?'
+    for idx, part in enumerate(parts):
+        last = idx == len(parts) - 1
+        if part == '**':
+            regex += '.*' if last else '(?:.*/)?'
+            continue
+        regex += translate_segment(part)
+        if not last:
+            regex += '/'
+    return regex
+
+
+def translate_segment(segment):
+    """Translate the glob characters of a single path segment"""
+    out = []
+    i = 0
+    n = len(segment)
+    while i < n:
+        c = segment[i]
+        if c == '*':
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(segment[i]))
+        elif c == '[':
+            start = i + 1
+            if segment[start:start + 1] in ('!', '^'):
+                start += 1
+            # A ] right after the opening bracket is part of the class
+            end = segment.find(']', start + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = segment[i + 1:end]
+                if body[:1] in ('!', '^'):
+                    body = '^' + body[1:]
+                out.append('[' + body.replace('\\', '\\\\') + ']')
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out)
+
+
+def parse_ignore_lines(lines):
+    """Yield (pattern, negated, dir_only) for the meaningful lines of an ignore file"""
+    for line in lines:
+        line = line.rstrip('\n').rstrip('\r')
+        # Trailing spaces are ignored unless escaped
+        stripped = line.rstrip(' ')
+        if stripped.endswith('\\') and len(stripped) < len(line):
+            stripped += ' '
+        line = stripped
+        if not line or line.startswith('#'):
+            continue
+        negated = line.startswith('!')
+        if negated:
+            line = line[1:]
+        elif line.startswith('\\#') or line.startswith('\\!'):
+            line = line[1:]
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        if line:
+            yield line, negated, dir_only
+
+
+class IgnoreRules:
+    """Patterns of a single ignore file, compiled into two combined regexes.
+
+    The alternatives are emitted in reverse file order, so the first alternative
+    that matches is the last matching line, which is the one gitignore honours.
+    Plain names without glob characters and without negations in the file are
+    answered from a set instead of running the regex.
+    """
+
+    def __init__(self, patterns):
+        self.has_negations = any(negated for _, negated, _ in patterns)
+        self.literal_names = {}
+        self.negated_groups = set()
+
+        dir_alternatives = []
+        file_alternatives = []
+        for idx, (pattern, negated, dir_only) in reversed(list(enumerate(patterns))):
+            if (not self.has_negations and '/' not in pattern
+                    and not any(c in pattern for c in '*?[\\')):
+                # A file-or-dir match wins over a dir-only one for the same name
+                self.literal_names[pattern] = self.literal_names.get(pattern, True) and dir_only
+                continue
+            group = f'r{idx}'
+            if negated:
+                self.negated_groups.add(group)
+            alternative = f'(?P<{group}>{glob_to_regex(pattern)})'
+            dir_alternatives.append(alternative)
+            if not dir_only:
+                file_alternatives.append(alternative)
+
+        self.dir_regex = re.compile('|'.join(dir_alternatives)) if dir_alternatives else None
+        self.file_regex = re.compile('|'.join(file_alternatives)) if file_alternatives else None
+
+    def match(self, rel_path, is_dir):
+        """Return True (ignored), False (re-included by !) or None (no rule applies)"""
+        name = rel_path.rsplit('/', 1)[-1]
+        dir_only = self.literal_names.get(name)
+        if dir_only is not None and (is_dir or not dir_only):
+            return True
+
+        regex = self.dir_regex if is_dir else self.file_regex
+        if regex is None:
+            return None
+        m = regex.fullmatch(rel_path)
+        if m is None:
+            return None
+        return m.lastgroup not in self.negated_groups
+
+    @classmethod
+    def from_file(cls, path):
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                patterns = list(parse_ignore_lines(f))
+        except OSError:
+            return None
+        return cls(patterns) if patterns else None
+
+
+def find_repo_top(path):
+    """Return the closest directory at or above path that contains .git, or None"""
+    current = os.path.abspath(path)
+    while True:
+        if os.path.exists(os.path.join(current, '.git')):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+class IgnoreMatcher:
+    """All ignore files that apply below a repository top, keyed by their directory.
+
+    Paths are given relative to the repository top using '/' separators. The
+    deepest ignore file with a matching rule decides, as with git itself.
+    """
+
+    def __init__(self, top, filenames=(GITIGNORE,)):
+        self.top = top
+        self.filenames = tuple(filenames)
+        self.rules = {}
+        self.loaded = set()
+
+    def load_dir(self, rel_dir, names=None):
+        """Load the ignore files of one directory (rel_dir '' is the top).
+
+        names, when given, is the set of entry names already read from the
+        directory, so no extra stat is needed to find the ignore files.
+        """
+        if rel_dir in self.loaded:
+            return
+        self.loaded.add(rel_dir)
+        patterns_from = []
+        for filename in self.filenames:
+            if names is not None and filename not in names:
+                continue
+            rules = IgnoreRules.from_file(os.path.join(self.top, rel_dir, filename))
+            if rules is not None:
+                patterns_from.append(rules)
+        if patterns_from:
+            self.rules[rel_dir] = patterns_from
+
+    def load_parents(self, rel_dir):
+        """Load ignore files of every directory from the top down to rel_dir"""
+        self.load_dir('')
+        parts = rel_dir.split('/') if rel_dir else []
+        for depth in range(1, len(parts) + 1):
+            self.load_dir('/'.join(parts[:depth]))
+
+    @classmethod
+    def for_root(cls, root, eslintignore=False):
+        """Build a matcher for the checkout containing root, or None outside a git checkout"""
+        top = find_repo_top(root)
+        if top is None:
+            return None
+        filenames = (GITIGNORE, ESLINTIGNORE) if eslintignore else (GITIGNORE,)
+        return cls(top, filenames)
+
+    def relative(self, path):
+        """Return path relative to the repository top, '' for the top itself"""
+        rel = os.path.relpath(os.path.abspath(path), self.top).replace(os.sep, '/')
+        return '' if rel == '.' else rel
+
+    def is_ignored(self, rel_path, is_dir):
+        if not self.rules:
+            return False
+        parts = rel_path.split('/')
+        # Deepest ignore file first; the first decisive answer wins
+        for depth in range(len(parts) - 1, -1, -1):
+            base = '/'.join(parts[:depth])
+            rulesets = self.rules.get(base)
+            if not rulesets:
+                continue
+            sub_path = '/'.join(parts[depth:])
+            for rules in reversed(rulesets):
+                result = rules.match(sub_path, is_dir)
+                if result is not None:
+                    return result
+        return False
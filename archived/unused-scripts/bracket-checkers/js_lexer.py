@@ -0,0 +1,462 @@
+import re
+
+# Bytes that can start a literal or comment; everything else is plain code
+LITERAL_START = re.compile(rb'["\'`/]')
+# The same inside a ${ } substitution, where braces are counted to find its end
+SUBSTITUTION_START = re.compile(rb'["\'`/{}]')
+# In JSX sources a < can open an element as well
+JSX_LITERAL_START = re.compile(rb'["\'`/<]')
+JSX_SUBSTITUTION_START = re.compile(rb'["\'`/{}<]')
+
+# The rest of a string after its opening quote; group 1 is the closing quote,
+# and an unterminated string ends at the line break
+STRING_BODIES = {
+    ord('"'): re.compile(rb'(?:[^"\\\r\n]+|\\(?:\r\n|[\s\S]))*(")?'),
+    ord("'"): re.compile(rb"(?:[^'\\\r\n]+|\\(?:\r\n|[\s\S]))*(')?"),
+}
+# Template text up to the closing backtick or the next ${. A \ or $ is only
+# taken together with the byte after it, so the text never ends in the middle
+# of an escape or a ${ when the data is cut off after it.
+TEMPLATE_TEXT = re.compile(rb'(?:[^`\\$]+|\\[\s\S]|\$(?=[^{]))*')
+LINE_END = re.compile(rb'[\r\n]')
+BLOCK_COMMENT_END = re.compile(rb'\*/')
+REGEX_LITERAL = re.compile(rb'/(?:[^/\\\[\r\n]|\\[^\r\n]|\[(?:[^\]\\\r\n]|\\[^\r\n])*\])+/[A-Za-z]*')
+
+JSX_SUFFIXES = ('.tsx', '.jsx')
+# group 1 is the element name, missing for a fragment <>
+JSX_OPEN_TAG = re.compile(rb'<([A-Za-z_$][\w$.:-]*)?')
+JSX_CLOSE_TAG = re.compile(rb'</\s*([A-Za-z_$][\w$.:-]*)?\s*>')
+# <T,>(, <T extends U>( and <T = U>( are type parameters of an arrow function, not elements
+TYPE_PARAMETERS = re.compile(rb'\s*(?:,|=|extends\b)')
+# After <T>: a parameter list, an optional return type and =>, as in the function
+# type `type F = <T>(x: T) => T` or a generic arrow function; parentheses nest two deep
+ARROW_SIGNATURE = re.compile(rb'>\s*\((?:[^()]|\((?:[^()]|\([^()]*\))*\))*\)\s*(?::[^=;{}()]*)?=>')
+# Inside a tag: attribute strings, {expression} containers and the end of the tag
+JSX_TAG_TOKEN = re.compile(rb'["\'{]|/?>')
+# Attribute strings have no escapes and may span lines, so they end at the next quote
+JSX_ATTRIBUTE_ENDS = {
+    ord('"'): re.compile(rb'"'),
+    ord("'"): re.compile(rb"'"),
+}
+# Children: text runs up to a nested tag or an {expression} container
+JSX_CHILD_START = re.compile(rb'[<{]')
+
+# A regex literal or a JSX tag must be decided within this many bytes after its
+# start; in a file read piece by piece, one that starts closer to the end of
+# the piece is held back and lexed again with the next piece
+LOOKAHEAD = 4096
+# Bytes of code kept from the previous piece for regex_allowed to look back at
+CONTEXT_SIZE = 16
+
+# translate() table that blanks a literal but keeps its line breaks
+BLANK = bytes(byte if byte in b'\r\n' else ord(' ') for byte in range(256))
+
+SLASH = ord('/')
+STAR = ord('*')
+BACKSLASH = ord('\\')
+BACKTICK = ord('`')
+OPEN_BRACE = ord('{')
+CLOSE_BRACE = ord('}')
+LESS_THAN = ord('<')
+WHITESPACE = frozenset(b' \t\r\n\v\f')
+# Identifier and number bytes; every non-ASCII byte counts, as in UTF-8 identifiers
+WORD_BYTES = frozenset(b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$' + bytes(range(128, 256)))
+# A / after one of these closes a value, so it divides
+VALUE_END = frozenset(b')]}"\'`')
+# ++ or -- directly after one of these is postfix, and so closes a value as well
+INCREMENT = frozenset(b'+-')
+POSTFIX_OPERAND = WORD_BYTES | frozenset(b')]')
+# Keywords after which an expression (and so a regex literal) starts
+REGEX_KEYWORDS = {
+    b'return', b'typeof', b'instanceof', b'in', b'of', b'new', b'delete', b'void',
+    b'throw', b'case', b'do', b'else', b'yield', b'await',
+}
+
+# Kinds of the entries on the lexer's mode stack; the last four are literals
+# that were cut off at the end of a piece and continue in the next one
+TEMPLATE, SUBSTITUTION, TAG, ELEMENT, EXPRESSION = range(5)
+STRING, LINE_COMMENT, BLOCK_COMMENT, ATTRIBUTE = range(5, 9)
+LITERAL_KINDS = frozenset((STRING, LINE_COMMENT, BLOCK_COMMENT, ATTRIBUTE))
+# What is reported for each kind still open at the end of the file
+UNCLOSED_MESSAGES = {
+    TEMPLATE: 'Unterminated template literal',
+    SUBSTITUTION: 'Unclosed ${{ in template literal',
+    TAG: 'Unterminated tag <{}',
+    ELEMENT: 'Unclosed <{}>',
+    EXPRESSION: 'Unclosed {{ in JSX expression',
+}
+
+
+def add_lexer_arguments(parser):
+    """Register the scanning mode option shared by the checker scripts"""
+    group = parser.add_argument_group('scanning')
+    group.add_argument('--lexer', action='store_true',
+                       help='ignore brackets and backticks inside strings, comments, '
+                            'template literal text and regex literals, and in .tsx/.jsx '
+                            'files inside JSX text and attribute strings')
+
+
+def is_jsx(path):
+    """True if path is a source file that may contain JSX"""
+    return path is not None and path.endswith(JSX_SUFFIXES)
+
+
+def regex_allowed(data, end):
+    """True if a / after the code that ends at end starts a regex literal rather than a division.
+
+    Decided from the last code byte: a regex follows an operator, punctuation
+    or an expression keyword, a division follows a value (including one ended
+    by a postfix ++ or --). The same rule tells a JSX element from a less-than
+    comparison or type arguments.
+    """
+    if end <= 0:
+        return True
+    prev = data[end - 1]
+    if prev in VALUE_END:
+        return False
+    if prev in INCREMENT and end >= 3 and data[end - 2] == prev and data[end - 3] in POSTFIX_OPERAND:
+        return False
+    if prev not in WORD_BYTES:
+        return True
+    start = end - 1
+    while start > 0 and data[start - 1] in WORD_BYTES:
+        start -= 1
+    return bytes(data[start:end]) in REGEX_KEYWORDS
+
+
+def jsx_tag_name(data, pos):
+    """Name of the JSX element whose opening tag starts at pos, or None if it is no tag.
+
+    A fragment <> has the empty name. Type parameters of a generic function
+    type or arrow function, which can stand where an expression could, are no tag.
+    """
+    match = JSX_OPEN_TAG.match(data, pos)
+    name = match.group(1)
+    if name is None:
+        return '' if data[pos + 1:pos + 2] == b'>' else None
+    if TYPE_PARAMETERS.match(data, match.end()) or ARROW_SIGNATURE.match(data, match.end()):
+        return None
+    return name.decode()
+
+
+def close_element(stack, name, offset, problems):
+    """Pop the open element that the closing tag </name> at offset ends.
+
+    The tag closes the innermost element of that name in the current JSX
+    tree, and elements left open inside it are reported. A name that matches
+    no open element is reported as a mismatch and closes the innermost
+    element, so the rest of the file stays in step.
+    """
+    depth = len(stack) - 1
+    while depth >= 0 and stack[depth][0] == ELEMENT and stack[depth][2] != name:
+        depth -= 1
+    if depth < 0 or stack[depth][0] != ELEMENT:
+        if problems is not None:
+            problems.append((offset, f'Closing tag </{name}> does not match <{stack[-1][2]}>'))
+        stack.pop()
+        return
+    if problems is not None:
+        for _, open_offset, open_name in stack[depth + 1:]:
+            problems.append((open_offset, f'Unclosed <{open_name}>'))
+    del stack[depth:]
+
+
+def literal_end(data, pos, kind, quote, final):
+    """(end, complete) of the literal of kind whose remaining bytes start at pos.
+
+    An incomplete literal runs into the end of data and is continued with the
+    next piece; with final set every literal is complete, unterminated or not.
+    """
+    if kind == STRING:
+        match = STRING_BODIES[quote].match(data, pos)
+        end = match.end()
+        # Short of the end of data the body only stops at the quote or a line
+        # break, or at a \ whose escaped byte is still to come
+        return end, final or match.group(1) is not None or (end < len(data) and data[end] != BACKSLASH)
+    if kind == ATTRIBUTE:
+        found = JSX_ATTRIBUTE_ENDS[quote].search(data, pos)
+    elif kind == LINE_COMMENT:
+        found = LINE_END.search(data, pos)
+        if found is not None:
+            return found.start(), True
+    else:
+        found = BLOCK_COMMENT_END.search(data, pos)
+    if found is not None:
+        return found.end(), True
+    end = len(data)
+    if kind == BLOCK_COMMENT and not final and end > pos and data[end - 1] == STAR:
+        # The * may be the start of the closing */
+        end -= 1
+    return end, final
+
+
+class Lexer:
+    """JS/TS lexer that yields the byte ranges of source that are not code.
+
+    Strings, comments and regex literals are yielded whole. Template literals
+    are tracked with a mode stack: their text is yielded piece by piece while
+    the backticks and the ${ } around each substitution stay code, and the
+    expression inside a substitution is lexed like any other code, nested
+    templates included. A single forward scan: a regex search finds the next
+    byte that can change the mode in C, and one anchored regex consumes the
+    literal it opens.
+
+    With jsx set, JSX elements go on the same stack: text children and
+    attribute strings are yielded, {expression} containers are lexed as code,
+    and every closing tag is paired with its opening tag as it is read.
+
+    The stack lives on the lexer, so a file can be lexed piece by piece (see
+    lex_chunks): spans() with final unset stops before the first thing the
+    bytes after data could still change and leaves its position in
+    stopped_at, and a literal cut off by the end of data is yielded as far as
+    it goes and finished by the next call.
+
+    If problems is a list, an (offset, message) pair is appended to it for
+    every closing tag that does not match its element, and for the innermost
+    template literal, substitution, tag or element still open at the end of
+    the file. Offsets are data offsets plus base.
+
+    Whether a / or < starts a regex literal or tag is decided by the code
+    before it; comments in between are skipped, so their text never decides.
+    """
+
+    def __init__(self, jsx=False, problems=None):
+        self.jsx = jsx
+        self.problems = problems
+        self.code_starts = (JSX_LITERAL_START, JSX_SUBSTITUTION_START) if jsx else (LITERAL_START, SUBSTITUTION_START)
+        # One [kind, offset, open braces / element name / quote] entry per open
+        # template literal, ${ } substitution, JSX tag, element, {expression}
+        # and cut-off literal, innermost last; offsets include base
+        self.stack = []
+        self.base = 0
+        self.stopped_at = 0
+        # End of the last comment, and of the code before that comment
+        self.comment_end = self.code_end = 0
+
+    def code_end_before(self, data, pos):
+        """Offset in data just past the last code byte before pos, skipping blanks and comments"""
+        comment_end = self.comment_end - self.base
+        end = pos
+        # Blanks at the end of a comment are part of it
+        while end > max(comment_end, 0) and data[end - 1] in WHITESPACE:
+            end -= 1
+        if end == comment_end:
+            return self.code_end - self.base
+        return end
+
+    def spans(self, data, pos=0, final=True):
+        """Yield (start, end) ranges of data from pos on that are not code"""
+        stack = self.stack
+        base = self.base
+        size = len(data)
+        while True:
+            kind = stack[-1][0] if stack else None
+            if kind in LITERAL_KINDS:
+                end, complete = literal_end(data, pos, kind, stack[-1][2], final)
+                if end > pos:
+                    yield pos, end
+                pos = end
+                if not complete:
+                    break
+                if kind == LINE_COMMENT or kind == BLOCK_COMMENT:
+                    self.comment_end = base + end
+                stack.pop()
+                continue
+            if kind == TEMPLATE:
+                end = TEMPLATE_TEXT.match(data, pos).end()
+                if end > pos:
+                    yield pos, end
+                pos = end
+                if data[end:end + 1] == b'`':
+                    stack.pop()
+                    pos = end + 1
+                elif data[end:end + 2] == b'${':
+                    stack.append([SUBSTITUTION, base + end, 0])
+                    pos = end + 2
+                else:
+                    # The end of data, possibly in front of a \ or $ that needs the next byte
+                    break
+                continue
+            if kind == TAG:
+                found = JSX_TAG_TOKEN.search(data, pos)
+                if found is None:
+                    # A / at the end may be the start of />
+                    pos = size - 1 if not final and size > pos and data[size - 1] == SLASH else size
+                    break
+                start = found.start()
+                token = found.group()
+                if token == b'{':
+                    stack.append([EXPRESSION, base + start, 0])
+                    pos = start + 1
+                elif token == b'>':
+                    # The tag is complete, its children follow
+                    stack[-1][0] = ELEMENT
+                    pos = start + 1
+                elif token == b'/>':
+                    stack.pop()
+                    pos = found.end()
+                else:
+                    pos, complete = literal_end(data, start + 1, ATTRIBUTE, data[start], final)
+                    yield start, pos
+                    if not complete:
+                        stack.append([ATTRIBUTE, base + start, data[start]])
+                        break
+                continue
+            if kind == ELEMENT:
+                found = JSX_CHILD_START.search(data, pos)
+                end = size if found is None else found.start()
+                if end > pos:
+                    yield pos, end
+                pos = end
+                if found is None:
+                    break
+                if data[end] == OPEN_BRACE:
+                    stack.append([EXPRESSION, base + end, 0])
+                    pos = end + 1
+                    continue
+                if not final and end > size - LOOKAHEAD:
+                    break
+                pos = end + 1
+                closing = JSX_CLOSE_TAG.match(data, end)
+                if closing is not None:
+                    close_element(stack, (closing.group(1) or b'').decode(), base + end, self.problems)
+                    pos = closing.end()
+                    continue
+                name = jsx_tag_name(data, end)
+                if name is not None:
+                    stack.append([TAG, base + end, name])
+                else:
+                    # A stray < is part of the text
+                    yield end, pos
+                continue
+
+            # Code, at the top level or inside a ${ } or {expression}
+            found = self.code_starts[bool(stack)].search(data, pos)
+            if found is None:
+                pos = size
+                break
+            start = found.start()
+            char = data[start]
+            pos = start + 1
+            if char == OPEN_BRACE:
+                stack[-1][2] += 1
+            elif char == CLOSE_BRACE:
+                if stack[-1][2]:
+                    stack[-1][2] -= 1
+                else:
+                    # The } that ends the substitution or expression, back to the enclosing mode
+                    stack.pop()
+            elif char == BACKTICK:
+                stack.append([TEMPLATE, base + start, None])
+            elif char == LESS_THAN:
+                if not final and start > size - LOOKAHEAD:
+                    pos = start
+                    break
+                name = jsx_tag_name(data, start) if regex_allowed(data, self.code_end_before(data, start)) else None
+                if name is not None:
+                    stack.append([TAG, base + start, name])
+            elif char == SLASH:
+                following = data[start + 1:start + 2]
+                if following == b'/' or following == b'*':
+                    comment = LINE_COMMENT if following == b'/' else BLOCK_COMMENT
+                    self.code_end = base + self.code_end_before(data, start)
+                    pos, complete = literal_end(data, start + 2, comment, None, final)
+                    yield start, pos
+                    if not complete:
+                        stack.append([comment, base + start, None])
+                        break
+                    self.comment_end = base + pos
+                elif not final and start > size - LOOKAHEAD:
+                    pos = start
+                    break
+                elif regex_allowed(data, self.code_end_before(data, start)):
+                    match = REGEX_LITERAL.match(data, start)
+                    # Otherwise a division operator
+                    if match is not None:
+                        yield start, match.end()
+                        pos = match.end()
+            else:
+                pos, complete = literal_end(data, start + 1, STRING, char, final)
+                yield start, pos
+                if not complete:
+                    stack.append([STRING, base + start, char])
+                    break
+        self.stopped_at = pos
+        if final and self.problems is not None and stack:
+            kind, offset, name = stack[-1]
+            self.problems.append((offset, UNCLOSED_MESSAGES[kind].format(name)))
+
+
+def literal_spans(data, problems=None, jsx=False):
+    """Yield (start, end) byte ranges of a whole JS/TS file that are not code (see Lexer)"""
+    return Lexer(jsx, problems).spans(data)
+
+
+def syntax_problems(data, jsx=False):
+    """(offset, message) of every template literal and JSX element the lexer finds unbalanced"""
+    problems = []
+    for _ in literal_spans(data, problems, jsx):
+        pass
+    return problems
+
+
+def code_only(data, jsx=False, problems=None):
+    """data with every non-code range blanked out by spaces.
+
+    Offsets, line breaks and the length stay the same, so every engine can
+    run on the result and report positions in the original file. data itself
+    is returned when it contains no literals at all. jsx and problems are
+    passed on to the Lexer.
+    """
+    code = None
+    for start, end in literal_spans(data, problems, jsx):
+        if end > start:
+            if code is None:
+                code = bytearray(data)
+            code[start:end] = code[start:end].translate(BLANK)
+    return data if code is None else code
+
+
+def lex_chunks(chunks, jsx=False, problems=None):
+    """code_only of a file given as a sequence of byte chunks, in constant memory.
+
+    Yields (raw, code) pairs that together cover the file once, code being raw
+    with its literals blanked exactly as code_only blanks them in the whole
+    file. The mode stack carries over from one chunk to the next; only what
+    the lexer cannot decide yet (a literal start within LOOKAHEAD bytes of the
+    end, a \ or $ in template text) is held back and lexed again with the
+    next chunk. Problem offsets count from the start of the file.
+    """
+    lexer = Lexer(jsx, problems)
+    # The last few bytes of code before pending, for regex_allowed to look back at
+    context = b''
+    pending = b''
+    offset = 0  # file offset of pending
+    chunks = iter(chunks)
+    chunk = next(chunks, None)
+    while chunk is not None:
+        following = next(chunks, None)
+        data = context + pending + chunk
+        start = len(context)
+        lexer.base = offset - start
+        # Whatever came between that code and pending is now the context's trailing blank
+        lexer.comment_end = lexer.code_end = lexer.base + len(context.rstrip(b' '))
+        code = None
+        for span_start, span_end in lexer.spans(data, start, final=following is None):
+            if span_end > span_start:
+                if code is None:
+                    code = bytearray(data)
+                code[span_start:span_end] = code[span_start:span_end].translate(BLANK)
+        stop = lexer.stopped_at
+        raw = data[start:stop]
+        yield raw, raw if code is None else code[start:stop]
+        if lexer.stack and lexer.stack[-1][0] in (LINE_COMMENT, BLOCK_COMMENT):
+            # Cut off in a comment: the code before it decides what follows it
+            end = lexer.code_end - lexer.base
+        else:
+            end = lexer.code_end_before(data, stop)
+        # A trailing blank keeps the last word apart from whatever follows
+        context = data[max(0, end - CONTEXT_SIZE):end] + (b' ' if end < stop else b'')
+        pending = data[stop:]
+        offset += stop - start
+        chunk = following
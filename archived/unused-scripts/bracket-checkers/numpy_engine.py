@@ -0,0 +1,116 @@
+# Vectorized bracket matching on top of NumPy (optional dependency).
+#
+# The file is viewed as a uint8 array, a lookup table maps it to bracket codes
+# and only the bracket positions are kept; matching is done with cumulative
+# sums instead of a per-character loop. For a +1/-1 sequence with prefix sums p,
+# a closer is unmatched exactly when p reaches a new minimum below zero, and an
+# opener at i is never closed exactly when p after i never drops below p[i].
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from bracket_engine import CLOSERS, OPENERS
+
+HAVE_NUMPY = np is not None
+
+
+def bracket_tokens(data):
+    """Return (positions, kinds, types) of all brackets in data.
+
+    kinds is +1 for an opener and -1 for a closer, types is 0/1/2 for round,
+    square and curly.
+    """
+    arr = np.frombuffer(data, dtype=np.uint8)
+    code = np.zeros(256, dtype=np.int8)
+    for type_idx, (opener, closer) in enumerate(zip(OPENERS, CLOSERS)):
+        code[opener] = type_idx + 1
+        code[closer] = -(type_idx + 1)
+    codes = code[arr]
+    positions = np.flatnonzero(codes)
+    token_codes = codes[positions].astype(np.int64)
+    kinds = np.sign(token_codes)
+    types = np.abs(token_codes) - 1
+    return positions, kinds, types
+
+
+def match_sequence(kinds):
+    """Vectorized stack matching of a +1/-1 sequence.
+
+    Returns (unmatched closer mask, unclosed opener mask, prefix sums).
+    """
+    if len(kinds) == 0:
+        empty = np.zeros(0, dtype=bool)
+        return empty, empty, np.zeros(0, dtype=np.int64)
+    prefix = np.cumsum(kinds)
+    running_min = np.minimum.accumulate(prefix)
+    previous_min = np.minimum(np.concatenate(([0], running_min[:-1])), 0)
+    unmatched = (kinds < 0) & (prefix < previous_min)
+
+    suffix_min = np.minimum.accumulate(prefix[::-1])[::-1]
+    following_min = np.concatenate((suffix_min[1:], [np.iinfo(np.int64).max]))
+    unclosed = (kinds > 0) & (following_min >= prefix)
+    return unmatched, unclosed, prefix
+
+
+def per_type_scan(data):
+    """Independent stack per bracket type, as in find_bracket_position_issues.
+
+    Returns (unmatched, unclosed): unmatched is a list of (offset, closer byte)
+    in file order, unclosed a list of (offset, opener byte) grouped by type in
+    the order round, square, curly and ascending within each type.
+    """
+    positions, kinds, types = bracket_tokens(data)
+    unmatched_offsets = []
+    unclosed = []
+    for type_idx in range(3):
+        selected = types == type_idx
+        type_positions = positions[selected]
+        unmatched_mask, unclosed_mask, _ = match_sequence(kinds[selected])
+        for offset in type_positions[unmatched_mask].tolist():
+            unmatched_offsets.append((offset, CLOSERS[type_idx]))
+        for offset in type_positions[unclosed_mask].tolist():
+            unclosed.append((offset, OPENERS[type_idx]))
+    unmatched_offsets.sort()
+    return unmatched_offsets, unclosed
+
+
+def nested_scan(data):
+    """One shared stack for all types, as in analyze_bracket_structure.
+
+    A closer always pops the top opener when there is one, whatever its type,
+    so the type-agnostic sequence decides which tokens pair up. Paired tokens
+    at the same depth alternate opener/closer in file order, so sorting them
+    by (depth, offset) lines every opener up with its closer and the type
+    interleaving check becomes one array comparison.
+
+    Returns (closer_issues, unclosed): closer_issues is a list of
+    (offset, closer byte, opener offset, opener byte) in file order, with
+    opener offset None for a closer that had nothing to close; unclosed is a
+    list of (offset, opener byte) in ascending order.
+    """
+    positions, kinds, types = bracket_tokens(data)
+    unmatched_mask, unclosed_mask, prefix = match_sequence(kinds)
+
+    closer_issues = [(offset, CLOSERS[type_idx], None, None) for offset, type_idx
+                     in zip(positions[unmatched_mask].tolist(), types[unmatched_mask].tolist())]
+    unclosed = [(offset, OPENERS[type_idx]) for offset, type_idx
+                in zip(positions[unclosed_mask].tolist(), types[unclosed_mask].tolist())]
+
+    paired = ~(unmatched_mask | unclosed_mask)
+    if paired.any():
+        # Depth of an opener is the prefix after it, of a closer the prefix before it
+        depth = prefix[paired] + (kinds[paired] < 0)
+        paired_positions = positions[paired]
+        order = np.lexsort((paired_positions, depth))
+        ordered_positions = paired_positions[order]
+        ordered_types = types[paired][order]
+        open_types, close_types = ordered_types[0::2], ordered_types[1::2]
+        mismatched = open_types != close_types
+        for open_offset, open_type, close_offset, close_type in zip(
+                ordered_positions[0::2][mismatched].tolist(), open_types[mismatched].tolist(),
+                ordered_positions[1::2][mismatched].tolist(), close_types[mismatched].tolist()):
+            closer_issues.append((close_offset, CLOSERS[close_type], open_offset, OPENERS[open_type]))
+        closer_issues.sort()
+    return closer_issues, unclosed
+
@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from file_buffer import FileBuffer, advise_sequential, will_need
+from text_stream import STREAM_THRESHOLD
+
+# Files read ahead while the current one is analysed
+DEFAULT_READ_AHEAD = 4
+
+
+def add_pipeline_arguments(parser, jobs=True):
+    """Register the processing options shared by the checker scripts"""
+    group = parser.add_argument_group('processing')
+    if jobs:
+        group.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                           help='analyse files in N worker processes (default: 1)')
+    group.add_argument('--read-ahead', type=int, default=DEFAULT_READ_AHEAD, metavar='N',
+                       help='read up to N files in background threads while analysing '
+                            f'(default: {DEFAULT_READ_AHEAD}, 0 reads each file on demand)')
+    group.add_argument('--prefetch', type=int, default=0, metavar='N',
+                       help='have the kernel start reading the next N files into the page cache '
+                            '(posix_fadvise WILLNEED; helps cold-cache scans, default: 0)')
+
+
+def content_digest(buffer):
+    """blake2b digest of a FileBuffer's raw bytes, or None if the file cannot be read"""
+    try:
+        return hashlib.blake2b(buffer.data).digest()
+    except OSError:
+        return None
+
+
+def file_size(path, sizes):
+    """Size recorded during discovery, or a fresh stat for sources that carry none"""
+    size = sizes.get(path) if sizes else None
+    if size is None:
+        try:
+            size = os.stat(path).st_size
+        except OSError:
+            size = 0
+    return size
+
+
+def largest_first(paths, sizes=None):
+    """Order paths by descending size so the longest jobs start first"""
+    return sorted(paths, key=lambda path: file_size(path, sizes), reverse=True)
+
+
+class ReadBuffers:
+    """Grow-only bytearrays recycled between the files that are read ahead.
+
+    A file is read with readinto() into a free bytearray and analysed through a
+    memoryview of the filled part; the bytearray goes back to the pool once its
+    FileBuffer is closed. Only a file larger than every buffer so far makes a
+    new allocation, so a long scan settles at a handful of buffers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.free = []
+
+    def acquire(self, size):
+        """A bytearray of at least size bytes"""
+        with self.lock:
+            buf = self.free.pop() if self.free else bytearray()
+        if len(buf) < size:
+            buf = bytearray(max(size, 2 * len(buf)))
+        return buf
+
+    def release(self, buf):
+        with self.lock:
+            self.free.append(buf)
+
+
+def prefetch_file(path, buffers, sizes=None):
+    """Return (memoryview of the contents of path, bytearray holding it).
+
+    (None, None) leaves the read to FileBuffer: unreadable files are analysed as
+    usual so they report their error, files large enough to be streamed are not
+    pulled into memory at all, and a file that grew while being read is mapped.
+    """
+    if file_size(path, sizes) >= STREAM_THRESHOLD:
+        return None, None
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            advise_sequential(f.fileno())
+            # One spare byte tells a complete read from a file that has grown since the stat
+            buf = buffers.acquire(size + 1)
+            length = f.readinto(buf)
+    except OSError:
+        return None, None
+    if length > size:
+        buffers.release(buf)
+        return None, None
+    return memoryview(buf)[:length], buf
+
+
+class KernelPrefetch:
+    """Keeps the kernel count files ahead of whoever reads paths.
+
+    advance() reports that the reader has started on the next path; the count
+    paths after everything started so far are then hinted with will_need(),
+    which begins an asynchronous read into the page cache. Files the reader
+    already has in hand are never hinted, so the window really covers the next
+    ones. advance() may be called from any thread. With a count of 0 or less no file
+    is hinted at all.
+    """
+
+    def __init__(self, paths, count):
+        self.lock = threading.Lock()
+        self.paths = list(paths) if count > 0 else []
+        self.count = count
+        self.dispatched = self.hinted = 0
+
+    def advance(self, started=1):
+        with self.lock:
+            self.dispatched += started
+            start = max(self.hinted, self.dispatched)
+            end = min(self.dispatched + self.count, len(self.paths))
+            hint = self.paths[start:end]
+            self.hinted = max(start, end)
+        for path in hint:
+            will_need(path)
+
+
+def put_until_stopped(ready, item, stop):
+    """Block until ready has room for item; give up once stop is set"""
+    while not stop.is_set():
+        try:
+            ready.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+
+async def read_ahead(paths, depth, ready, stop, buffers, sizes=None, hints=None):
+    """Read paths in order on the default thread pool and put their contents on ready.
+
+    At most depth reads are in flight; the bounded ready queue blocks the hand-over
+    when the analysis falls behind, which in turn holds back new reads. hints, a
+    KernelPrefetch, is advanced as each read is scheduled. If a read
+    fails with anything but the OSError prefetch_file handles, the exception is
+    put on ready in place of the contents, so the consumer raises it instead of
+    waiting forever.
+    """
+    in_flight = deque()
+    try:
+        for path in paths:
+            if stop.is_set():
+                return
+            in_flight.append(asyncio.ensure_future(asyncio.to_thread(prefetch_file, path, buffers, sizes)))
+            if hints is not None:
+                hints.advance()
+            if len(in_flight) >= depth:
+                await asyncio.to_thread(put_until_stopped, ready, await in_flight.popleft(), stop)
+        while in_flight:
+            await asyncio.to_thread(put_until_stopped, ready, await in_flight.popleft(), stop)
+    except BaseException as error:
+        put_until_stopped(ready, (error, None), stop)
+
+
+def iter_buffers(paths, depth=DEFAULT_READ_AHEAD, sizes=None, prefetch=0):
+    """Yield a FileBuffer for every path, in the given order, with up to depth files read ahead.
+
+    The reads run in an asyncio event loop on a helper thread, so waiting for a
+    cold disk or a network home directory overlaps with the analysis of the
+    previous files. Each buffer is closed once the caller asks for the next one,
+    and its read buffer is then reused for a later file. With prefetch, the
+    kernel is additionally kept that many files ahead of the reads already
+    under way (see KernelPrefetch).
+    """
+    paths = list(paths)
+    hints = KernelPrefetch(paths, prefetch)
+    if depth <= 0:
+        for path in paths:
+            hints.advance()
+            with FileBuffer(path) as buffer:
+                yield buffer
+        return
+
+    ready = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    buffers = ReadBuffers()
+    reader = threading.Thread(target=asyncio.run,
+                              args=(read_ahead(paths, depth, ready, stop, buffers, sizes, hints),),
+                              daemon=True)
+    reader.start()
+    try:
+        for path in paths:
+            data, read_buffer = ready.get()
+            if isinstance(data, BaseException):
+                raise data
+            with FileBuffer(path, data) as buffer:
+                yield buffer
+            if read_buffer is not None:
+                buffers.release(read_buffer)
+    finally:
+        stop.set()
+        reader.join()
+
+
+def check_path(check, path):
+    """Run check on a FileBuffer for path and release the buffer afterwards"""
+    with FileBuffer(path) as buffer:
+        return check(buffer)
+
+
+def run_checks(check, paths, jobs=1, sizes=None, read_ahead=DEFAULT_READ_AHEAD, prefetch=0):
+    """Yield (path, check(FileBuffer(path))) for every path, in sorted path order.
+
+    In a single process the next read_ahead files are read while one is being
+    checked (see iter_buffers). With jobs > 1 the files are dispatched to a
+    process pool largest-first, so a big file cannot start last and stretch the
+    tail of the run; results are still handed out in sorted order as soon as the
+    next one is ready. prefetch keeps the kernel that many files ahead of the
+    files already being read, by the reader thread or the busy workers.
+    """
+    ordered = sorted(paths)
+    if jobs <= 1:
+        for buffer in iter_buffers(ordered, read_ahead, sizes, prefetch):
+            yield buffer.path, check(buffer)
+        return
+
+    dispatch = largest_first(ordered, sizes)
+    hints = KernelPrefetch(dispatch, prefetch)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {}
+        for path in dispatch:
+            futures[path] = pool.submit(check_path, check, path)
+        # Each worker opens its first file right away and the next one as a job finishes
+        hints.advance(jobs)
+        for path in dispatch:
+            futures[path].add_done_callback(lambda future: hints.advance())
+        for path in ordered:
+            yield path, futures[path].result()
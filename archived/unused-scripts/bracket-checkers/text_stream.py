@@ -0,0 +1,93 @@
+from bracket_engine import CHUNK_SIZE
+
+# Files at least this large are analysed piece by piece instead of being loaded whole
+STREAM_THRESHOLD = 16 << 20
+
+
+def should_stream(buffer):
+    """True if buffer is a file on disk large enough for the streaming analysis"""
+    return buffer.path is not None and buffer.size >= STREAM_THRESHOLD
+
+
+def iter_chunks(path, chunk_size=CHUNK_SIZE):
+    """Yield the raw contents of a file in pieces of about chunk_size bytes.
+
+    Line endings are turned into \\n (universal newlines), with a \\r at the end
+    of a piece held back until the next read shows whether it is part of a
+    \\r\\n. Nothing is decoded, and byte offsets within a line are the same as
+    in the file.
+    """
+    held_cr = b''
+    with open(path, 'rb') as f:
+        while True:
+            raw = f.read(chunk_size)
+            chunk = held_cr + raw
+            held_cr = b''
+            if raw and chunk.endswith(b'\r'):
+                held_cr = b'\r'
+                chunk = chunk[:-1]
+            if b'\r' in chunk:
+                chunk = chunk.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+            yield chunk
+            if not raw:
+                return
+
+
+def iter_lines(path):
+    """Yield the raw lines of a file exactly like FileBuffer.lines, one at a time"""
+    partial = []
+    for chunk in iter_chunks(path):
+        pieces = chunk.split(b'\n')
+        partial.append(pieces[0])
+        if len(pieces) > 1:
+            yield b''.join(partial)
+            yield from pieces[1:-1]
+            partial = [pieces[-1]]
+    yield b''.join(partial)
+
+
+def read_lines(path, line_nums):
+    """Return {line_num: raw line} for the given 1-based line numbers, in one pass over the file"""
+    wanted = set(line_nums)
+    found = {}
+    if not wanted:
+        return found
+    last = max(wanted)
+    for line_num, line in enumerate(iter_lines(path), 1):
+        if line_num in wanted:
+            found[line_num] = line
+        if line_num >= last:
+            break
+    return found
+
+
+def line_positions(path, offsets):
+    """Return {offset: (line_num, byte column)} for offsets into the iter_chunks stream, in one pass"""
+    wanted = sorted(set(offsets))
+    found = {}
+    if not wanted:
+        return found
+    idx = 0
+    line_num = 1
+    line_start = 0  # offset of the current line's start
+    chunk_start = 0
+    for chunk in iter_chunks(path):
+        pos = 0
+        # A line's \n counts as part of it, at column len(line)
+        while idx < len(wanted) and wanted[idx] <= chunk_start + len(chunk):
+            end = wanted[idx] - chunk_start
+            newlines = chunk.count(b'\n', pos, end)
+            if newlines:
+                line_num += newlines
+                line_start = chunk_start + chunk.rindex(b'\n', pos, end) + 1
+            found[wanted[idx]] = (line_num, wanted[idx] - line_start)
+            pos = end
+            idx += 1
+        if idx == len(wanted):
+            break
+        newlines = chunk.count(b'\n', pos)
+        if newlines:
+            line_num += newlines
+            line_start = chunk_start + chunk.rindex(b'\n', pos) + 1
+        chunk_start += len(chunk)
+    return found